@@ -1,10 +1,13 @@
+import os
 import pyperclip
 from google_auth_oauthlib.flow import InstalledAppFlow
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+# The bot reloads this file when it changes and keeps the token refreshed from then on
+TOKEN_FILE = os.environ.get('GOOGLE_TOKEN_FILE', 'token.json')
 flow = InstalledAppFlow.from_client_secrets_file('creds.json', SCOPES)
 creds = flow.run_local_server(port=0)
 # Save the credentials for the next run
-with open('token.json', 'w') as token:
+with open(TOKEN_FILE, 'w') as token:
     token.write(creds.to_json())
     pyperclip.copy(str(creds.to_json()))
\ No newline at end of file
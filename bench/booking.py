@@ -0,0 +1,507 @@
+# Offline load test of the booking flow.
+#
+# Replays N concurrent users through TakeMeetingView.take_meeting,
+# TimeSlotsDropdown.callback and ConfirmMeetingView.confirm against an
+# in-process Google Calendar service and fake nextcord objects.
+#
+#   python bench/booking.py --users 50 --latency 0.15 --discord-latency 0.05
+#
+# With --push the calendar watch receiver is served locally and the fake
+# service posts a notification on every change, like Google does.
+
+import os
+import sys
+import time
+import json
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+import urllib.request
+
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+os.environ.setdefault('GOOGLE_TOKEN', repr({'token': 'bench', 'refresh_token': 'bench', 'client_id': 'bench', 'client_secret': 'bench'}))
+os.environ.setdefault('SCOPES', repr(['https://www.googleapis.com/auth/calendar']))
+os.environ.setdefault('GOOGLE_CALENDAR_ID', 'bench')
+os.environ.setdefault('UTC', 'Europe/Paris')
+os.environ.setdefault('CLIENT_ROLE_ID', '1')
+os.environ.setdefault('GUILD_ID', '1')
+os.environ.setdefault('MEETINGS_DB', ':memory:')
+
+import httplib2
+
+from aiohttp import web
+from pytz import timezone as pytimezone
+from googleapiclient.errors import HttpError
+from nextcord import ui
+
+from cogs import Meetings
+
+
+def http_error(status: int) -> HttpError:
+    return HttpError(httplib2.Response({'status': status}), json.dumps({'error': {'code': status}}).encode())
+
+
+class FakeRequest():
+    def __init__(self, service: "FakeService", method: str, handler) -> None:
+        self.service = service
+        self.method = method
+        self.handler = handler
+        self.headers: dict[str, str] = {}
+
+    def execute(self, http=None, num_retries=0):
+        self.service.calls[self.method] += 1
+        time.sleep(self.service.latency)
+        with self.service.lock:
+            return self.handler(self.headers)
+
+
+class FakeEvents():
+    def __init__(self, service: "FakeService") -> None:
+        self.service = service
+
+    def list(self, calendarId, syncToken=None, pageToken=None, **kwargs):
+        return FakeRequest(self.service, 'list', lambda headers: self.service.list(syncToken))
+
+    def get(self, calendarId, eventId):
+        return FakeRequest(self.service, 'get', lambda headers: self.service.get(eventId))
+
+    def insert(self, calendarId, body):
+        return FakeRequest(self.service, 'insert', lambda headers: self.service.insert(body))
+
+    def update(self, calendarId, eventId, body):
+        return FakeRequest(self.service, 'update', lambda headers: self.service.update(eventId, body, headers.get('If-Match')))
+
+    def delete(self, calendarId, eventId):
+        return FakeRequest(self.service, 'delete', lambda headers: self.service.delete(eventId, headers.get('If-Match')))
+
+    def watch(self, calendarId, body):
+        return FakeRequest(self.service, 'watch', lambda headers: self.service.watch(body))
+
+
+class FakeChannels():
+    def __init__(self, service: "FakeService") -> None:
+        self.service = service
+
+    def stop(self, body):
+        return FakeRequest(self.service, 'stop', lambda headers: self.service.subscribers.pop(body['id'], None) and "")
+
+
+class FakeService():
+    # Stand-in for googleapiclient's calendar service with etags, 409 on
+    # duplicate ids, 412 on stale If-Match and syncToken deltas.
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.store: dict[str, dict] = {}
+        self.changes: list[tuple[int, str]] = []
+        self.sequence = 0
+        self.subscribers: dict[str, dict] = {}
+
+    def events(self) -> FakeEvents:
+        return FakeEvents(self)
+
+    def channels(self) -> FakeChannels:
+        return FakeChannels(self)
+
+    def touch(self, event: dict) -> dict:
+        self.sequence += 1
+        event['etag'] = f'"{self.sequence}"'
+        event['updated'] = datetime.utcnow().isoformat() + 'Z'
+        self.changes.append((self.sequence, event['id']))
+        for channel in list(self.subscribers.values()):
+            threading.Thread(target=self.post, args=(channel, "exists"), daemon=True).start()
+        return dict(event)
+
+    def post(self, channel: dict, state: str) -> None:
+        request = urllib.request.Request(channel['address'], method='POST', headers={
+            'X-Goog-Channel-ID': channel['id'],
+            'X-Goog-Channel-Token': channel['token'],
+            'X-Goog-Resource-State': state,
+        })
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except OSError as error:
+            print(f"push: notification to {channel['address']} failed: {error}")
+
+    def watch(self, body):
+        self.subscribers[body['id']] = body
+        threading.Thread(target=self.post, args=(body, "sync"), daemon=True).start()
+        expiration = (time.time() + int(body['params']['ttl'])) * 1000
+        return {'id': body['id'], 'resourceId': 'bench', 'expiration': str(int(expiration))}
+
+    def list(self, syncToken):
+        if syncToken:
+            since = int(syncToken)
+            ids = {event_id for sequence, event_id in self.changes if sequence > since}
+            items = [dict(self.store[event_id]) for event_id in ids]
+        else:
+            items = [dict(event) for event in self.store.values() if event.get('status') != 'cancelled']
+        return {'items': items, 'nextSyncToken': str(self.sequence)}
+
+    def get(self, eventId):
+        if eventId not in self.store:
+            raise http_error(404)
+        return dict(self.store[eventId])
+
+    def insert(self, body):
+        event = dict(body, id=body.get('id') or uuid.uuid4().hex, status=body.get('status', 'confirmed'))
+        if event['id'] in self.store:
+            raise http_error(409)
+        self.store[event['id']] = event
+        return self.touch(event)
+
+    def update(self, eventId, body, etag):
+        if eventId not in self.store:
+            raise http_error(404)
+        if etag and etag != self.store[eventId]['etag']:
+            raise http_error(412)
+        event = dict(body, id=eventId, status=body.get('status', 'confirmed'))
+        self.store[eventId] = event
+        return self.touch(event)
+
+    def delete(self, eventId, etag):
+        if eventId not in self.store:
+            raise http_error(404)
+        if self.store[eventId].get('status') == 'cancelled':
+            raise http_error(410)
+        if etag and etag != self.store[eventId]['etag']:
+            raise http_error(412)
+        self.store[eventId]['status'] = 'cancelled'
+        self.touch(self.store[eventId])
+        return ""
+
+    def add_availability(self, start: datetime, end: datetime) -> None:
+        self.insert({
+            'summary': 'disponible',
+            'start': {'dateTime': start.isoformat(), 'timeZone': os.environ['UTC']},
+            'end': {'dateTime': end.isoformat(), 'timeZone': os.environ['UTC']},
+        })
+
+
+class Discord():
+    latency = 0.0
+    calls: Counter = Counter()
+
+    @classmethod
+    async def call(cls, route: str) -> None:
+        cls.calls[route] += 1
+        await asyncio.sleep(cls.latency)
+
+
+class FakeRole():
+    def __init__(self, id: int) -> None:
+        self.id = id
+
+
+class FakeMember():
+    def __init__(self, id: int, roles: list) -> None:
+        self.id = id
+        self.roles = roles
+        self.bot = False
+        self.mention = f"<@{id}>"
+
+    def __str__(self) -> str:
+        return f"user{self.id}"
+
+    async def add_roles(self, *roles) -> None:
+        await Discord.call("add_roles")
+
+
+class FakeHistory():
+    def __init__(self, messages: list) -> None:
+        self.messages = messages
+
+    async def flatten(self) -> list:
+        await Discord.call("history")
+        return self.messages
+
+
+class FakeMessage():
+    def __init__(self, channel: "FakeTextChannel", content, embed=None, view=None) -> None:
+        self.id = random.getrandbits(48)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.mentions = []
+
+    async def edit(self, **kwargs) -> None:
+        await Discord.call("edit_message")
+
+    async def pin(self) -> None:
+        await Discord.call("pin")
+
+
+class FakeCategory():
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.channels: list = []
+        self.overwrites: dict = {}
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class FakeTextChannel():
+    def __init__(self, guild: "FakeGuild", name: str, category: FakeCategory, overwrites=None) -> None:
+        self.id = random.getrandbits(48)
+        self.guild = guild
+        self.name = name
+        self.category = category
+        self.overwrites: dict = dict(overwrites or {})
+        self.messages: list[FakeMessage] = []
+        category.channels.append(self)
+
+    async def send(self, content=None, embed=None, view=None, **kwargs) -> FakeMessage:
+        await Discord.call("send")
+        message = FakeMessage(self, content, embed, view)
+        self.messages.append(message)
+        return message
+
+    def history(self, oldest_first: bool = True, limit: int = 1) -> FakeHistory:
+        return FakeHistory(self.messages[:limit])
+
+    def get_partial_message(self, id: int) -> FakeMessage:
+        return next((message for message in self.messages if message.id == id), FakeMessage(self, None))
+
+    async def set_permissions(self, target, **kwargs) -> None:
+        await Discord.call("set_permissions")
+        self.overwrites[target] = kwargs
+
+    async def edit(self, category=None, overwrites=None, **kwargs) -> None:
+        await Discord.call("edit_channel")
+        if overwrites is not None:
+            self.overwrites = dict(overwrites)
+        if category is not None:
+            self.category.channels.remove(self)
+            self.category = category
+            category.channels.append(self)
+
+    async def purge(self, limit=None) -> None:
+        await Discord.call("purge")
+
+
+class FakeGuild():
+    def __init__(self) -> None:
+        self.id = int(os.environ['GUILD_ID'])
+        self.client_role = FakeRole(int(os.environ['CLIENT_ROLE_ID']))
+        self.categories = [FakeCategory("Rendez-vous"), FakeCategory("Archives")]
+        self.members: dict[int, FakeMember] = {}
+        self.menu = FakeTextChannel(self, "prise-de-rdv", self.categories[0])
+
+    @property
+    def text_channels(self) -> list:
+        return [channel for category in self.categories for channel in category.channels]
+
+    @property
+    def channels(self) -> list:
+        return self.text_channels
+
+    def get_role(self, id: int):
+        return self.client_role if id == self.client_role.id else None
+
+    def get_member(self, id: int):
+        return self.members.get(id)
+
+    def get_channel(self, id: int):
+        return next((channel for channel in self.text_channels if channel.id == id), None)
+
+    async def create_text_channel(self, name: str, category: FakeCategory, overwrites=None, **kwargs) -> FakeTextChannel:
+        await Discord.call("create_channel")
+        return FakeTextChannel(self, name, category, overwrites)
+
+
+class FakeResponse():
+    def __init__(self) -> None:
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def defer(self, **kwargs) -> None:
+        await Discord.call("interaction_response")
+        self.done = True
+
+    async def send_message(self, *args, **kwargs) -> None:
+        await Discord.call("interaction_response")
+        self.done = True
+
+    async def send_modal(self, modal) -> None:
+        await Discord.call("interaction_response")
+        self.done = True
+
+    async def edit_message(self, **kwargs) -> None:
+        await Discord.call("interaction_response")
+        self.done = True
+
+
+class FakeFollowup():
+    def __init__(self) -> None:
+        self.sent: list[dict] = []
+
+    async def send(self, content=None, **kwargs) -> None:
+        await Discord.call("followup")
+        self.sent.append(dict(kwargs, content=content))
+
+
+class FakeInteraction():
+    def __init__(self, guild: FakeGuild, user: FakeMember) -> None:
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.token = f"{random.getrandbits(64):x}"
+        self.channel = guild.menu
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    @property
+    def last(self) -> dict:
+        return self.followup.sent[-1] if self.followup.sent else {}
+
+
+async def press(view: ui.View, name: str, interaction: FakeInteraction) -> None:
+    item = getattr(view, name)
+    if isinstance(item, ui.Item):
+        await item.callback(interaction) #type: ignore
+    else:
+        await item(None, interaction)
+
+
+async def book(guild: FakeGuild, user: FakeMember, results: dict) -> None:
+    started = time.perf_counter()
+
+    interaction = FakeInteraction(guild, user)
+    await Meetings.TakeMeetingView().take_meeting(interaction) #type: ignore
+    view = interaction.last.get('view')
+    if not view:
+        results['no_slot'] += 1
+        return
+
+    dropdown = next(child for child in view.children if isinstance(child, Meetings.TimeSlotsDropdown))
+    # Users mostly aim at the first slots, which is where the contention is
+    option = random.choice(dropdown.options[:max(1, len(dropdown.options) // 4)])
+    dropdown._selected_values = [option.value]
+
+    interaction = FakeInteraction(guild, user)
+    await dropdown.callback(interaction) #type: ignore
+    view = interaction.last.get('view')
+    if not isinstance(view, Meetings.ConfirmMeetingView):
+        results['lost'] += 1
+        results['latencies'].append(time.perf_counter() - started)
+        return
+
+    interaction = FakeInteraction(guild, user)
+    await press(view, 'confirm', interaction)
+    embed = interaction.last.get('embed')
+    if embed is not None and embed.title == "Rendez-vous pris!":
+        results['booked'][view.event.id] += 1
+    else:
+        results['lost'] += 1
+    results['latencies'].append(time.perf_counter() - started)
+
+
+async def monitor_loop(lag: dict, interval: float = 0.005) -> None:
+    while True:
+        before = time.perf_counter()
+        await asyncio.sleep(interval)
+        overshoot = time.perf_counter() - before - interval
+        if overshoot > 0.001:
+            lag['blocked'] += overshoot
+        lag['max'] = max(lag['max'], overshoot)
+
+
+def percentile(values: list[float], rank: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(rank * (len(values) - 1))))]
+
+
+async def run(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    Discord.latency = args.discord_latency
+
+    service = FakeService(args.latency)
+    tenant = Meetings.tenants.get(int(os.environ['GUILD_ID']))
+    tenant.calendar.service = service
+    now = datetime.now(pytimezone(os.environ['UTC'])).replace(minute=0, second=0, microsecond=0)
+    for day in range(1, args.days + 1):
+        start = (now + timedelta(days=day)).replace(hour=9)
+        service.add_availability(start, start.replace(hour=18))
+
+    guild = FakeGuild()
+    users = []
+    for id in range(1000, 1000 + args.users):
+        # Client role skips the form modal, the calendar path is the same
+        users.append(FakeMember(id, [guild.client_role]))
+        guild.members[id] = users[-1]
+
+    push = []
+    if args.push:
+        app = web.Application()
+        app.router.add_post(Meetings.WATCH_PATH, Meetings.tenants.receive)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1] #type: ignore
+        tenant.watcher.address = f"http://127.0.0.1:{port}{Meetings.WATCH_PATH}"
+        push = [asyncio.create_task(tenant.watcher.ingest()), asyncio.create_task(tenant.watcher.run())]
+
+    lag = {'blocked': 0.0, 'max': 0.0}
+    monitor = asyncio.create_task(monitor_loop(lag))
+    results = {'latencies': [], 'booked': Counter(), 'lost': 0, 'no_slot': 0}
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*[book(guild, user, results) for user in users], return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+
+    propagation = None
+    if args.push:
+        # A slot cancelled straight in Google Calendar, as an admin would
+        free = next(event for event in service.store.values() if event.get('summary') == 'disponible' and event.get('status') != 'cancelled')
+        changed = time.perf_counter()
+        with service.lock:
+            service.delete(free['id'], None)
+        while free['id'] in tenant.calendar.cache.events and time.perf_counter() - changed < 10:
+            await asyncio.sleep(0.005)
+        propagation = time.perf_counter() - changed
+        for task in push:
+            task.cancel()
+        await runner.cleanup()
+
+    errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    bookings = sum(results['booked'].values())
+    double = sum(count - 1 for count in results['booked'].values() if count > 1)
+    api_calls = sum(service.calls.values())
+
+    print(f"users:                {args.users} ({args.latency * 1000:.0f}ms calendar, {args.discord_latency * 1000:.0f}ms discord)")
+    print(f"wall clock:           {elapsed:.2f}s")
+    print(f"bookings:             {bookings} booked, {results['lost']} lost the race, {results['no_slot']} saw no slot, {len(errors)} errors")
+    print(f"latency p50 / p99:    {percentile(results['latencies'], 0.5) * 1000:.0f}ms / {percentile(results['latencies'], 0.99) * 1000:.0f}ms")
+    print(f"api calls / booking:  {api_calls / max(bookings, 1):.2f} calendar ({dict(service.calls)}), {sum(Discord.calls.values()) / max(bookings, 1):.2f} discord")
+    print(f"double bookings:      {double}")
+    print(f"event loop blocked:   {lag['blocked'] * 1000:.0f}ms total, {lag['max'] * 1000:.1f}ms max")
+    if propagation is not None:
+        print(f"push propagation:     {propagation * 1000:.0f}ms, {tenant.watcher.stats['notifications']} notifications, {tenant.watcher.stats['syncs']} syncs")
+    for error in errors[:5]:
+        print(f"error: {type(error).__name__}: {error}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline load test of the booking flow")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.1, help="seconds added to every calendar call")
+    parser.add_argument('--discord-latency', type=float, default=0.05, help="seconds added to every discord call")
+    parser.add_argument('--days', type=int, default=3, help="days of availability to seed")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--push', action='store_true', help="serve the watch receiver and push changes to it")
+    asyncio.run(run(parser.parse_args()))
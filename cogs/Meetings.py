@@ -1,24 +1,52 @@
+import os
+import ast
+import gzip
+import json
 import math
+import time
+import random
+import secrets
+import uuid
+import base64
+import hashlib
+import heapq
+import bisect
+import sqlite3
+import itertools
+import functools
+import asyncio
+import httplib2
+import threading
 import nextcord
+import google_auth_httplib2
 
 from os import environ as env
 from datetime import datetime, timedelta
 from pytz import timezone as pytimezone
 from asyncio import sleep
-from typing import Union
+from typing import Awaitable, Callable, Union
 from io import StringIO
+from aiohttp import web
+from collections import Counter
+from contextlib import contextmanager
 from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
 
 from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request as AuthRequest
+import requests
 from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+from googleapiclient.errors import HttpError
 
 from nextcord.ext import commands, application_checks
 from nextcord import (
-    Button, 
     ButtonStyle, 
     Colour,
     Embed, 
+    File,
     Interaction, 
+    InteractionType,
     Member,
     SelectOption, 
     SlashOption, 
@@ -31,15 +59,69 @@ from nextcord import (
     slash_command)
 
 
+def parse_env(name: str):
+    # JSON or plain Python literals, never evaluated as code
+    value = env[name]
+    try:
+        return json.loads(value)
+    except ValueError:
+        return ast.literal_eval(value)
+
+
 #GOOGLE VARS
-GOOGLE_TOKEN = eval(env['GOOGLE_TOKEN'])
-SCOPES = eval(env['SCOPES'])
-GOOGLE_CALENDAR_ID = env['GOOGLE_CALENDAR_ID']
+GOOGLE_TOKEN = parse_env('GOOGLE_TOKEN')
+SCOPES = parse_env('SCOPES')
+GOOGLE_TOKEN_FILE = env.get('GOOGLE_TOKEN_FILE', 'token.json')
+TOKEN_REFRESH_MARGIN = float(env.get('TOKEN_REFRESH_MARGIN', 300))
 UTC = env['UTC']
+CALENDAR_WORKERS = int(env.get('CALENDAR_WORKERS', 8))
+TENANT_WORKERS = int(env.get('TENANT_WORKERS', CALENDAR_WORKERS))
+CACHE_HORIZON_DAYS = int(env.get('CACHE_HORIZON_DAYS', 7))
+BOOKING_HORIZON_DAYS = int(env.get('BOOKING_HORIZON_DAYS', 7))
+CACHE_MAX_STALENESS = float(env.get('CACHE_MAX_STALENESS', 30))
+SLOT_MINUTES = int(env.get('SLOT_MINUTES', 30))
+SLOT_BUFFER = int(env.get('SLOT_BUFFER', 10))
+RESERVATION_TIMEOUT = float(env.get('RESERVATION_TIMEOUT', 15 * 60))
+CALENDAR_RETRIES = int(env.get('CALENDAR_RETRIES', 4))
+CALENDAR_TIMEOUT = float(env.get('CALENDAR_TIMEOUT', 10))
+CALENDAR_DEADLINE = float(env.get('CALENDAR_DEADLINE', 25))
+CALENDAR_RATE = float(env.get('CALENDAR_RATE', 10))
+BREAKER_THRESHOLD = int(env.get('BREAKER_THRESHOLD', 5))
+BREAKER_COOLDOWN = float(env.get('BREAKER_COOLDOWN', 30))
+HTTP_HOST = env.get('HTTP_HOST', '127.0.0.1')
+HTTP_PORT = int(env.get('HTTP_PORT', 0))
+METRICS_LOG_INTERVAL = float(env.get('METRICS_LOG_INTERVAL', 0))
+WATCH_ADDRESS = env.get('WATCH_ADDRESS', '')
+WATCH_PATH = "/calendar/notifications"
+WATCH_TTL = int(env.get('WATCH_TTL', 7 * 24 * 3600))
+WATCH_RENEW_MARGIN = float(env.get('WATCH_RENEW_MARGIN', 3600))
+WATCH_MAX_STALENESS = float(env.get('WATCH_MAX_STALENESS', 3600))
+POLL_INTERVAL = float(env.get('POLL_INTERVAL', 300))
+# Only what the bot reads is transferred, descriptions can hold the 1000 characters of the form
+LIST_FIELDS = "nextPageToken,nextSyncToken,items(id,etag,status,updated,summary,start,end,colorId,location,reminders,extendedProperties)"
+LIST_FIELDS_WITH_DESCRIPTION = LIST_FIELDS[:-1] + ",description)"
+PAGE_SIZE = 2500
+BATCH_SIZE = 50 # Google Calendar rejects batches of more than 50 requests
+SELECT_LIMIT = 25 # Discord rejects selects with more than 25 options
+
+MEETINGS_DB = env.get('MEETINGS_DB', 'meetings.db')
+REHYDRATE_CONCURRENCY = int(env.get('REHYDRATE_CONCURRENCY', 10))
+ARCHIVE_DIR = env.get('ARCHIVE_DIR', 'transcripts')
+ARCHIVE_INTERVAL = float(env.get('ARCHIVE_INTERVAL', 0))
+ARCHIVE_AFTER_DAYS = float(env.get('ARCHIVE_AFTER_DAYS', 7))
+ARCHIVE_BATCH = int(env.get('ARCHIVE_BATCH', 5))
+ARCHIVE_PAUSE = float(env.get('ARCHIVE_PAUSE', 5))
+REST_CONCURRENCY = int(env.get('REST_CONCURRENCY', 5))
+REST_RETRIES = int(env.get('REST_RETRIES', 3))
 
 #DISCORD VARS
-CLIENT_ROLE_ID = int(env['CLIENT_ROLE_ID'])
-GUILD_ID = int(env['GUILD_ID'])
+LEGACY_MEETING_BUTTONS = {"meet_close_button": "close", "take_other_meet": "retake"}
+# One community per guild: {"<guild id>": {"calendar_id": ..., "client_role_id": ..., "token_file": ...}}.
+# Without TENANTS the bot serves GUILD_ID with GOOGLE_CALENDAR_ID, as a single community.
+if 'TENANTS' in env:
+    TENANTS = {int(guild_id): settings for guild_id, settings in parse_env('TENANTS').items()}
+else:
+    TENANTS = {int(env['GUILD_ID']): {'calendar_id': env['GOOGLE_CALENDAR_ID'], 'client_role_id': int(env['CLIENT_ROLE_ID'])}}
 
 
 class MLStripper(HTMLParser):
@@ -62,52 +144,742 @@ def strip_tags(html):
     s.feed(html)
     return s.get_data()
 
-class Calendar():
+
+class Metrics():
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.seconds: Counter = Counter()
+        self.histograms: dict[str, list[int]] = {}
+        self.loop_lag = 0.0
+        self.loop_lag_max = 0.0
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        self.calls[name] += 1
+        self.seconds[name] += seconds
+        if error:
+            self.errors[name] += 1
+        histogram = self.histograms.setdefault(name, [0] * len(self.BUCKETS))
+        histogram[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(name, time.perf_counter() - started, True)
+            raise
+        self.observe(name, time.perf_counter() - started)
+
+    def timed(self, name: str):
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def quantile(self, name: str, rank: float) -> float:
+        histogram = self.histograms.get(name, [])
+        target = rank * sum(histogram)
+        seen = 0
+        for bucket, count in zip(self.BUCKETS, histogram):
+            seen += count
+            if count and seen >= target:
+                return bucket
+        return 0.0
+
+    async def monitor_loop(self, interval: float = 0.5) -> None:
+        while True:
+            started = time.perf_counter()
+            await sleep(interval)
+            self.loop_lag = max(time.perf_counter() - started - interval, 0.0)
+            self.loop_lag_max = max(self.loop_lag_max, self.loop_lag)
+            self.observe("loop.lag", self.loop_lag)
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE meeter_calls_total counter",
+            *[f'meeter_calls_total{{span="{name}"}} {count}' for name, count in sorted(self.calls.items())],
+            "# TYPE meeter_errors_total counter",
+            *[f'meeter_errors_total{{span="{name}"}} {count}' for name, count in sorted(self.errors.items())],
+            "# TYPE meeter_span_seconds histogram",
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            total = 0
+            for bucket, count in zip(self.BUCKETS, histogram):
+                total += count
+                le = "+Inf" if bucket == float('inf') else bucket
+                lines.append(f'meeter_span_seconds_bucket{{span="{name}",le="{le}"}} {total}')
+            lines.append(f'meeter_span_seconds_sum{{span="{name}"}} {self.seconds[name]:.6f}')
+            lines.append(f'meeter_span_seconds_count{{span="{name}"}} {total}')
+        lines += [
+            "# TYPE meeter_loop_lag_seconds gauge",
+            f"meeter_loop_lag_seconds {self.loop_lag:.6f}",
+            f"meeter_loop_lag_max_seconds {self.loop_lag_max:.6f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def report(self) -> list[str]:
+        lines = []
+        for name, count in self.calls.most_common():
+            average = self.seconds[name] / count * 1000
+            lines.append(
+                f"{name}: {count} appels, {self.errors[name]} erreurs, "
+                f"moy {average:.0f}ms, p50 ≤{self.quantile(name, 0.5) * 1000:.0f}ms, p99 ≤{self.quantile(name, 0.99) * 1000:.0f}ms")
+        return lines
+
+
+metrics = Metrics()
+
+
+class RestQueue():
+    # Discord rate limits each route per resource, so calls are queued per bucket: a route and
+    # its major parameter (channel, guild or interaction token). A bucket runs a bounded number
+    # of calls at once and a 429 parks it for its retry_after instead of failing the caller.
+    # Calls are retried after the wait, so they are given as a callable and its arguments.
+    def __init__(self, concurrency: int, retries: int) -> None:
+        self.concurrency = concurrency
+        self.retries = retries
+        self.buckets: dict[tuple[str, Union[int, str]], asyncio.Semaphore] = {}
+        # Callers holding or waiting for a bucket, idle buckets are dropped
+        self.users: dict[tuple[str, Union[int, str]], int] = {}
+        self.parked: dict[tuple[str, Union[int, str]], float] = {}
+        self.stats = {'rate_limited': 0, 'parked': 0}
+
+    def acquire(self, key: tuple[str, Union[int, str]]) -> asyncio.Semaphore:
+        if key not in self.buckets:
+            self.buckets[key] = asyncio.Semaphore(self.concurrency)
+        self.users[key] = self.users.get(key, 0) + 1
+        return self.buckets[key]
+
+    def release(self, key: tuple[str, Union[int, str]]) -> None:
+        self.users[key] -= 1
+        if self.users[key]:
+            return
+        del self.users[key]
+        del self.buckets[key]
+        if self.parked.get(key, 0.0) <= time.monotonic():
+            self.parked.pop(key, None)
+
+    async def submit(self, route: str, major: Union[int, str], call: Callable[..., Awaitable], *args, **kwargs):
+        key = (route, major)
+        try:
+            async with self.acquire(key):
+                for attempt in itertools.count():
+                    delay = self.parked.get(key, 0.0) - time.monotonic()
+                    if delay > 0:
+                        self.stats['parked'] += 1
+                        await sleep(delay)
+                    try:
+                        with metrics.span(f"discord.{route}"):
+                            return await call(*args, **kwargs)
+                    except nextcord.HTTPException as error:
+                        if error.status != 429 or attempt >= self.retries:
+                            raise
+                        self.stats['rate_limited'] += 1
+                        retry_after = float(error.response.headers.get('Retry-After', 1))
+                        self.parked[key] = max(self.parked.get(key, 0.0), time.monotonic() + retry_after)
+        finally:
+            self.release(key)
+
+
+rest_queue = RestQueue(REST_CONCURRENCY, REST_RETRIES)
+
+
+async def rest(route: str, major: Union[int, str], call: Callable[..., Awaitable], *args, **kwargs):
+    return await rest_queue.submit(route, major, call, *args, **kwargs)
+
+
+async def respond(call: Callable[..., Awaitable], *args, **kwargs):
+    # The initial interaction response has its own limit and a 3 seconds deadline, it is never queued
+    with metrics.span("discord.interaction_response"):
+        return await call(*args, **kwargs)
+
+
+def overwrites_for(category, member, **permissions) -> dict:
+    # The category overwrites plus the member's, so creating or moving a channel
+    # sets its permissions in the same request instead of a sync then a set_permissions
+    overwrites = dict(category.overwrites) if category else {}
+    overwrites[member] = nextcord.PermissionOverwrite(**permissions)
+    return overwrites
+
+
+class EventConflict(Exception):
+    pass
+
+
+class CalendarUnavailable(Exception):
+    pass
+
+
+class SingleFlight():
+    # Concurrent identical calls share one in-flight request and its result
     def __init__(self) -> None:
-        self.creds = self.get_creds()
-        self.service = build('calendar', 'v3', credentials=self.creds)
+        self.inflight: dict[tuple, asyncio.Future] = {}
+        self.stats = {'misses': 0, 'coalesced': 0}
+
+    async def do(self, key: tuple, call: Callable):
+        future = self.inflight.get(key)
+        if future is None:
+            self.stats['misses'] += 1
+            future = asyncio.ensure_future(call())
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.stats['coalesced'] += 1
+        return await asyncio.shield(future)
+
+
+class TokenBucket():
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await sleep((1 - self.tokens) / self.rate)
+
+
+class CircuitBreaker():
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Union[float, None] = None
+        self.trial = False
+        self.trial_at = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.is_open:
+            return False
+        # A probe that never reported back (cancelled) stops blocking after a cooldown
+        if self.trial and time.monotonic() - self.trial_at < self.cooldown:
+            return False
+        # Half open: let a single call through to probe the API
+        self.trial = True
+        self.trial_at = time.monotonic()
+        return True
+
+    def release(self) -> None:
+        # The probe ended without an answer either way
+        self.trial = False
+
+    def success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.trial or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+        self.trial = False
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        return status == 429 or status >= 500 or (status == 403 and b"ateLimitExceeded" in (error.content or b""))
+    return isinstance(error, (asyncio.TimeoutError, OSError, httplib2.HttpLib2Error))
+
+
+async def send_unavailable(interaction: Interaction) -> None:
+    embed = Embed(
+        title="L'agenda est momentanément indisponible",
+        description="Réessayez dans quelques minutes.",
+        color=Colour.red()
+    )
+    if interaction.response.is_done():
+        await rest("followup", interaction.token, interaction.followup.send, embed=embed, ephemeral=True)
+    else:
+        await respond(interaction.response.send_message, embed=embed, ephemeral=True)
+
+
+def slot_id(calendar_id: str, start: datetime) -> str:
+    # Every slot has a fixed event id so two bookings of the same slot collide, google only accepts base32hex ids
+    digest = hashlib.sha1(f"{calendar_id}:{int(start.timestamp())}".encode()).digest()
+    return base64.b32hexencode(digest).decode().lower().rstrip("=")
+
+
+WEEKDAYS = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche")
+
+
+@functools.lru_cache(maxsize=None)
+def get_tz(name: str):
+    return pytimezone(name)
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_time(value: str) -> datetime:
+    # All-day events only have a date, they start at midnight in the bot's timezone
+    if len(value) == 10:
+        return get_tz(UTC).localize(datetime.fromisoformat(value))
+    # fromisoformat only understands the 'Z' suffix from python 3.11
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(get_tz(UTC))
+
+
+def event_time(time: dict) -> datetime:
+    return parse_time(time.get('dateTime', time.get('date')))
+
+
+class EventCache():
+    def __init__(self, calendar: "Calendar", horizon: timedelta, max_staleness: float) -> None:
+        self.calendar = calendar
+        self.horizon = horizon
+        self.max_staleness = max_staleness
+        self.events: dict[str, dict] = {}
+        self.sync_token: Union[str, None] = None
+        # End of the window the last full sync covered, incremental syncs only report changes
+        self.window_end: Union[datetime, None] = None
+        self.synced_at: Union[float, None] = None
+        self.lock = asyncio.Lock()
+        self.listeners: list[Callable[[dict], None]] = []
+        # Bumped on every change, lets derived state know when it is outdated
+        self.version = 0
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+        # Sequence of our own writes, a pull only overrides the ones made before it started
+        self.writes = 0
+        self.written: dict[str, int] = {}
+
+    def is_fresh(self) -> bool:
+        return self.synced_at is not None and time.monotonic() - self.synced_at < self.max_staleness
+
+    async def sync(self, force: bool = False) -> None:
+        stats = self.stats
+        if self.is_fresh() and not force:
+            stats['hits'] += 1
+            return
+        async with self.lock:
+            # Concurrent readers wait on the lock and reuse the sync that was running
+            if self.is_fresh() and not force:
+                stats['coalesced'] += 1
+                return
+            stats['misses'] += 1
+            try:
+                await self.pull()
+            except CalendarUnavailable:
+                # Answer from the last known state rather than failing every click
+                if self.synced_at is None:
+                    raise
+                print("calendar: unavailable, serving cached events")
+                return
+            except HttpError as error:
+                # 410 Gone: the sync token expired, start over with a full sync
+                if error.resp.status != 410:
+                    raise
+                self.sync_token = None
+                await self.pull()
+            self.synced_at = time.monotonic()
+
+    async def pull(self) -> None:
+        now = datetime.now(pytimezone(UTC))
+        if self.window_end is not None and now + self.horizon > self.window_end:
+            # The horizon moved past the synced window, slide it with a new full sync
+            self.sync_token = None
+        full = self.sync_token is None
+        # syncToken can't be combined with timeMin/timeMax or orderBy, the full sync sets the window
+        # with a day of slack so that it is only slid once a day
+        timeMin = now - timedelta(days=1) if full else None
+        timeMax = now + self.horizon + timedelta(days=1) if full else None
+        started = self.writes
+        items: list[dict] = []
+        sync_token = None
+        async for page in self.calendar.iter_pages(
+                syncToken=self.sync_token,
+                timeMin=timeMin.isoformat() if timeMin else None,
+                timeMax=timeMax.isoformat() if timeMax else None,
+                singleEvents=True):
+            items.extend(page.get('items', []))
+            sync_token = page.get('nextSyncToken')
+        if full:
+            self.window_end = timeMax
+
+        if full:
+            # Replace-merge: what the snapshot doesn't have is dropped, unless we wrote it meanwhile
+            seen = {event['id'] for event in items}
+            for eventId in [eventId for eventId in self.events if eventId not in seen]:
+                if self.written.get(eventId, 0) <= started:
+                    self.events.pop(eventId)
+                    self.version += 1
+        for event in items:
+            if 'start' in event and event_time(event['start']) > self.window_end:
+                # Deltas aren't bounded by the window, what lies beyond it is left to the next slide
+                self.events.pop(event['id'], None)
+                continue
+            self.merge(event, started)
+        self.sync_token = sync_token
+        self.written = {eventId: write for eventId, write in self.written.items() if write > started}
+
+    def merge(self, event: dict, started: int) -> None:
+        current = self.events.get(event['id'])
+        if current is not None and current.get('etag') == event.get('etag'):
+            return
+        if self.written.get(event['id'], 0) > started:
+            # The snapshot was fetched before our write landed, keep ours unless the server's is newer
+            if current is None or event.get('updated', "") <= current.get('updated', ""):
+                return
+        self.store(event)
+
+    def apply(self, event: dict) -> None:
+        # An event returned by one of our writes
+        self.writes += 1
+        self.written[event['id']] = self.writes
+        self.store(event)
+
+    def store(self, event: dict) -> None:
+        self.version += 1
+        if event.get('status') == 'cancelled':
+            self.events.pop(event['id'], None)
+        else:
+            self.events[event['id']] = event
+        for listener in self.listeners:
+            listener(event)
+
+    def discard(self, eventId: str) -> None:
+        self.writes += 1
+        self.written[eventId] = self.writes
+        self.version += 1
+        self.events.pop(eventId, None)
+
+    def invalidate(self) -> None:
+        self.synced_at = None
+
+    async def get_event(self, eventId: str) -> Union[dict, None]:
+        await self.sync()
+        return self.events.get(eventId)
+
+    async def list_events(self, timeMin: datetime, timeMax: Union[datetime, None] = None, sync: bool = True) -> list[dict]:
+        # Without sync, answers from what is cached however old it is
+        if sync:
+            await self.sync()
+        timeMax = timeMax or timeMin + self.horizon
+        events = [
+            event for event in self.events.values()
+            if timeMin <= event_time(event['end']) and event_time(event['start']) <= timeMax
+        ]
+        events.sort(key=lambda event: event_time(event['start']))
+        return events
+
+
+class CredentialManager():
+    # Keeps the OAuth token fresh ahead of expiry so no user click pays for a refresh.
+    # The token file written by auth/log.py takes precedence over GOOGLE_TOKEN and is
+    # picked up again whenever it changes. Only the default file has GOOGLE_TOKEN to fall back on.
+    def __init__(self, path: str, info: Union[dict, None], scopes: list) -> None:
+        self.path = path
+        self.info = info
+        self.scopes = scopes
+        self.creds: Union[Credentials, None] = None
+        self.mtime: Union[float, None] = None
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+
+    def load(self) -> Credentials:
+        with self.lock:
+            mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            if mtime is not None and mtime != self.mtime:
+                self.creds = Credentials.from_authorized_user_file(self.path, self.scopes)
+                self.mtime = mtime
+            elif self.creds is None:
+                if self.info is None:
+                    raise FileNotFoundError(f"token file {self.path} is missing")
+                self.creds = Credentials.from_authorized_user_info(self.info, self.scopes)
+            return self.creds
+
+    def expires_in(self) -> float:
+        creds = self.load()
+        if not creds.token or not creds.expiry:
+            return 0.0
+        return (creds.expiry - datetime.utcnow()).total_seconds()
+
+    def refresh(self) -> None:
+        creds = self.load()
+        with self.lock:
+            creds.refresh(AuthRequest(session=self.session))
+            self.save(creds)
+
+    def save(self, creds: Credentials) -> None:
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as token:
+            token.write(creds.to_json())
+        os.replace(temporary, self.path)
+        self.mtime = os.path.getmtime(self.path)
+
+    async def keep_fresh(self, executor: ThreadPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if await loop.run_in_executor(executor, self.expires_in) < TOKEN_REFRESH_MARGIN:
+                    await loop.run_in_executor(executor, self.refresh)
+                wait = await loop.run_in_executor(executor, self.expires_in) - TOKEN_REFRESH_MARGIN
+            except Exception as error:
+                print(f"calendar: token refresh failed: {error}")
+                wait = 30
+            await sleep(min(max(wait, 30), 600))
+
+
+class PooledHttp():
+    # Requests are built on the event loop but run on the calendar pool, so the
+    # transport is resolved by the thread that actually sends them.
+    def __init__(self, calendar: "Calendar") -> None:
+        self.calendar = calendar
+
+    def request(self, *args, **kwargs):
+        return self.calendar.transport().request(*args, **kwargs)
+
+
+class Calendar():
+    def __init__(self, calendar_id: str, credentials: CredentialManager, workers: int = CALENDAR_WORKERS) -> None:
+        # Credentials and the discovery based service are built on first use, not at import
+        self.calendar_id = calendar_id
+        self.credentials = credentials
+        self.transports = threading.local()
+        self.http = PooledHttp(self)
+        self._service = None
+        self.service_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="calendar")
+        # The slot browser reads the cache too, it has to cover the booking horizon
+        horizon = timedelta(days=max(CACHE_HORIZON_DAYS, BOOKING_HORIZON_DAYS))
+        self.cache = EventCache(self, horizon, CACHE_MAX_STALENESS)
+        self.bucket = TokenBucket(CALENDAR_RATE, CALENDAR_RATE)
+        self.breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+        self.flight = SingleFlight()
 
     def get_creds(self) -> Credentials:
-        creds = Credentials.from_authorized_user_info(GOOGLE_TOKEN, SCOPES)
-        return creds
+        return self.credentials.load()
+
+    @property
+    def service(self):
+        with self.service_lock:
+            if self._service is None:
+                # static_discovery uses the document bundled with google-api-python-client, no network
+                self._service = build(
+                    'calendar', 'v3',
+                    http=self.http,
+                    requestBuilder=self.build_request,
+                    static_discovery=True,
+                    cache_discovery=False)
+            return self._service
+
+    @service.setter
+    def service(self, service) -> None:
+        self._service = service
+
+    async def warm_up(self) -> None:
+        started = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(self.executor, lambda: self.service)
+        print(f"calendar: client ready in {time.perf_counter() - started:.2f}s")
+
+    def transport(self) -> google_auth_httplib2.AuthorizedHttp:
+        # httplib2.Http is not thread safe, each pool thread keeps its own keep-alive connection
+        creds = self.get_creds()
+        http = getattr(self.transports, 'http', None)
+        if http is None or http.credentials is not creds:
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=CALENDAR_TIMEOUT))
+            self.transports.http = http
+        return http
+
+    def build_request(self, http, *args, **kwargs) -> HttpRequest:
+        return HttpRequest(self.http, *args, **kwargs)
+
+    async def execute(self, request, idempotent: bool = True):
+        # The google client is blocking, run it on the calendar pool to keep the event loop free.
+        # A timed out call keeps running in its thread, so a write that isn't idempotent
+        # isn't sent a second time on top of it.
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + CALENDAR_DEADLINE
+        for attempt in range(CALENDAR_RETRIES + 1):
+            if not self.breaker.allow():
+                raise CalendarUnavailable("circuit open")
+            await self.bucket.acquire()
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, request.execute),
+                    min(CALENDAR_TIMEOUT, max(deadline - time.monotonic(), 0.1)))
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as error:
+                if not is_retryable(error):
+                    # Google answered, the API itself is healthy
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                # Exponential backoff with full jitter
+                delay = random.uniform(0, min(16, 0.5 * 2 ** attempt))
+                timed_out = isinstance(error, asyncio.TimeoutError) and not idempotent
+                if timed_out or attempt == CALENDAR_RETRIES or time.monotonic() + delay >= deadline:
+                    raise CalendarUnavailable(str(error)) from error
+                await sleep(delay)
+            else:
+                self.breaker.success()
+                return result
     
-    def get_event(self, eventId):
-        return self.service.events().get(calendarId=GOOGLE_CALENDAR_ID, eventId=eventId).execute()
-
-    def list_events(self, timeMin: Union[datetime, None] = None, timeMax: Union[datetime, None] = None):
-        min = timeMin.isoformat() if isinstance(timeMin, datetime) else None
-        max = timeMax.isoformat() if isinstance(timeMax, datetime) else None
+    def request(self, method: str, **kwargs):
+        return getattr(self.service.events(), method)(calendarId=self.calendar_id, **kwargs)
+
+    @metrics.timed("calendar.batch")
+    async def batch(self, requests: list) -> list[tuple[Union[dict, None], Union[HttpError, None]]]:
+        # One round trip per BATCH_SIZE requests, results are returned in the order of the requests
+        results: list[tuple[Union[dict, None], Union[HttpError, None]]] = [(None, None)] * len(requests)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        for index in range(0, len(requests), BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=callback)
+            for request_id, request in enumerate(requests[index:index + BATCH_SIZE], index):
+                batch.add(request, request_id=str(request_id))
+            await self.execute(batch)
+
+        for response, _ in results:
+            if response:
+                self.cache.apply(response)
+        return results
+    
+    @metrics.timed("calendar.get_event")
+    async def get_event(self, eventId):
+        return await self.flight.do(
+            ('get', eventId),
+            lambda: self.execute(self.service.events().get(calendarId=self.calendar_id, eventId=eventId)))
 
-        result = self.service.events().list(
-            calendarId=GOOGLE_CALENDAR_ID,
-            timeMin=min,
-            timeMax=max,
-            orderBy="startTime",
-            singleEvents=True).execute()
+    async def iter_events(
+            self,
+            timeMin: Union[datetime, None] = None,
+            timeMax: Union[datetime, None] = None,
+            q: Union[str, None] = None,
+            private: Union[dict, None] = None,
+            fields: str = LIST_FIELDS):
+        # Yields events as their page arrives, callers never hold the whole listing
+        async for page in self.iter_pages(
+                fields,
+                timeMin=timeMin.isoformat() if timeMin else None,
+                timeMax=timeMax.isoformat() if timeMax else None,
+                q=q,
+                privateExtendedProperty=[f"{key}={value}" for key, value in private.items()] if private else None,
+                orderBy="startTime",
+                singleEvents=True):
+            for event in page.get('items', []):
+                yield event
+
+    async def iter_pages(self, fields: str = LIST_FIELDS, **params):
+        # Streams events.list page by page, the last page carries nextSyncToken
+        page_token = None
+        while True:
+            page = await self.list_page(pageToken=page_token, fields=fields, **params)
+            yield page
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+
+    @metrics.timed("calendar.list_page")
+    async def list_page(self, **params):
+        return await self.execute(self.request('list', maxResults=PAGE_SIZE, **params))
+
+    @metrics.timed("calendar.insert_event")
+    async def insert_event(self, body: dict):
+        event = await self.execute(self.service.events().insert(calendarId=self.calendar_id, body=body), idempotent=False)
+        self.cache.apply(event)
+        return event
+    
+    @metrics.timed("calendar.update_event")
+    async def update_event(self, eventId, body, etag: Union[str, None] = None):
+        request = self.request('update', eventId=eventId, body=body)
+        if etag:
+            # Only write if nobody changed the event since we read it
+            request.headers['If-Match'] = etag
+        try:
+            event = await self.execute(request)
+        except HttpError as error:
+            if error.resp.status == 412:
+                self.cache.invalidate()
+                raise EventConflict(eventId) from error
+            raise
+        self.cache.apply(event)
+        return event
 
+    @metrics.timed("calendar.delete_event")
+    async def delete_event(self, eventId, etag: Union[str, None] = None):
+        request = self.request('delete', eventId=eventId)
+        if etag:
+            request.headers['If-Match'] = etag
+        try:
+            result = await self.execute(request)
+        except HttpError as error:
+            if error.resp.status == 412:
+                self.cache.invalidate()
+                raise EventConflict(eventId) from error
+            # 410 Gone: already deleted
+            if error.resp.status != 410:
+                raise
+            result = None
+        self.cache.discard(eventId)
         return result
 
-    def insert_event(self, body: dict):
-        return self.service.events().insert(calendarId=GOOGLE_CALENDAR_ID, body=body).execute()
-    
-    def update_event(self, eventId, body):
-        return self.service.events().update(calendarId=GOOGLE_CALENDAR_ID, eventId=eventId, body=body).execute()  
+    @metrics.timed("calendar.watch")
+    async def watch(self, channel_id: str, address: str, token: str, ttl: int) -> dict:
+        return await self.execute(self.request('watch', body={
+            'id': channel_id,
+            'type': "web_hook",
+            'address': address,
+            'token': token,
+            'params': {'ttl': str(ttl)},
+        }))
 
-    def delete_event(self, eventId):
-        return self.service.events().delete(calendarId=GOOGLE_CALENDAR_ID, eventId=eventId).execute()
+    @metrics.timed("calendar.stop_channel")
+    async def stop_channel(self, channel_id: str, resource_id: str) -> None:
+        await self.execute(self.service.channels().stop(body={'id': channel_id, 'resourceId': resource_id}))
 
 class CalendarEvent():
-    def __init__(self, event) -> None:
+    __slots__ = (
+        'id', 'etag', 'summary', 'description', 'start', 'end', 'offset',
+        'timezone', 'day', 'all_day', 'reminders', 'colorId', 'location', 'private', 'calendar')
+
+    # Parsed times by (id, etag), an unchanged event is never parsed twice
+    parsed: dict[tuple[str, str], tuple] = {}
+    PARSED_LIMIT = 4096
+
+    def __init__(self, event, calendar: Union["Calendar", None] = None) -> None:
+        self.calendar = calendar
+        self.id = event.get('id', None)
+        self.etag = event.get('etag', None)
+        self.summary = event.get('summary', "")
+        self.description = event.get('description', "")
+        self.reminders = event.get('reminders', None)
+        self.colorId = event.get('colorId', None)
+        self.location = event.get('location', "")
+        # Booking state: user, channel, message and status ids, queryable with privateExtendedProperty
+        self.private: dict[str, str] = dict(event.get('extendedProperties', {}).get('private', {}))
         if event:
-            self.id = event.get('id', None)
-            self.summary = event.get('summary', "")
-            self.description = event.get('description', "")
-            self.start, self.end, self.offset, self.timezone, self.day = self.event_strp(event)
-            self.reminders = event.get('reminders', None)
-            self.colorId = event.get('colorId', None)
-            self.location = event.get('location', "")
+            self.start, self.end, self.offset, self.timezone, self.day, self.all_day = self.event_strp(event)
+        else:
+            self.start = self.end = self.offset = self.timezone = self.day = None
+            self.all_day = False
+
+    def __bool__(self) -> bool:
+        return self.id is not None
 
     def build_event(self):
+        key = 'date' if self.all_day else 'dateTime'
         event = {
             'id': self.id, 
             'summary': self.summary, 
@@ -115,91 +887,52 @@ class CalendarEvent():
             'colorId': self.colorId,
             'location': self.location, 
             'start': {
-                'dateTime': self.start.isoformat(), 
+                key: self.start.date().isoformat() if self.all_day else self.start.isoformat(), 
                 'timeZone': self.timezone
                 }, 
             'end': {
-                'dateTime': self.end.isoformat(), 
+                key: self.end.date().isoformat() if self.all_day else self.end.isoformat(), 
                 'timeZone': self.timezone
                 }, 
             'reminders': self.reminders, 
+            'extendedProperties': {'private': self.private},
             }
 
         return event
 
-    def check_event(self) -> bool:
-        now = datetime.now(pytimezone(UTC))  # 'Z' indicates UTC time
-        events = calendar.list_events(now, now + timedelta(days=7)).get('items', [])
+    async def save(self) -> None:
+        # Conditional write, raises EventConflict if the event changed since it was read
+        event = await self.calendar.update_event(self.id, self.build_event(), self.etag) #type: ignore
+        self.etag = event.get('etag', None)
 
-        for event in events:
-            event = CalendarEvent(event)
-            if event.id == self.id and event.summary == self.summary:
-                return True
-        return False
-
-    def split_disponible(self) -> list:
-        start = self.start
-        events = []
-        while start + timedelta(minutes=30) <= self.end:
-            slot = {
-                'summary': 'Créneau libre',
-                'colorId': 10,
-                'start': {
-                    'dateTime': (start).isoformat(),
-                    'timeZone': self.timezone
-                },
-                'end': {
-                    'dateTime': (start + timedelta(minutes=30)).isoformat(),
-                    'timeZone': self.timezone
-                }
-            }
-            start += timedelta(minutes=40)
-            events.append(CalendarEvent(calendar.insert_event(slot)))
+    async def check_event(self) -> bool:
+        event = await self.calendar.cache.get_event(self.id) #type: ignore
+        return bool(event) and event.get('summary', "") == self.summary
 
-        calendar.delete_event(self.id)
-        return events
+    def event_strp(self, event) -> tuple[datetime, datetime, str, str, str, bool]:
+        key = (self.id, self.etag)
+        if None not in key and key in self.parsed:
+            return self.parsed[key]
 
-    def time_strp(self, time) -> datetime:
-        time = datetime.strptime(time, '%Y-%m-%dT%H:%M:%S')
-        return time
-
-    def event_strp(self, event) -> tuple[datetime, datetime, str, str, str]:
         start = event['start'].get('dateTime', event['start'].get('date'))
-        offset = start[-6:]
-        start = start[:-6]
-        start = pytimezone(UTC).localize(self.time_strp(start))
-
-        end = event['end'].get('dateTime', event['end'].get('date'))
-        end = end[:-6]
-        end = pytimezone(UTC).localize(self.time_strp(end))
-
-        timezone: str = event['start'].get('timeZone')
-        weekday = self.get_weekday(start.weekday())
-        return (start), end, offset, timezone, weekday
+        all_day = 'dateTime' not in event['start']
+        offset = "+00:00" if all_day or start.endswith('Z') else start[-6:]
+        start = parse_time(start)
+        end = event_time(event['end'])
+
+        timezone: str = event['start'].get('timeZone', UTC)
+        parsed = (start, end, offset, timezone, self.get_weekday(start.weekday()), all_day)
+        if None not in key:
+            if len(self.parsed) >= self.PARSED_LIMIT:
+                self.parsed.clear()
+            self.parsed[key] = parsed
+        return parsed
 
     def get_weekday(self, day_number: int) -> str:
-        weekdays = {
-            0: "Lundi", 
-            1: "Mardi", 
-            2: "Mercredi",
-            3: "Jeudi", 
-            4: "Vendredi", 
-            5: "Samedi", 
-            6: "Dimanche"
-            }
-
-        return weekdays[day_number]
+        return WEEKDAYS[day_number]
 
     async def cancel_meeting(self, interaction: Union[Interaction, None] = None, event: bool = True):
-        if event:
-            self.summary = "Créneau libre"
-            self.description = ""
-            self.location = ""
-            self.colorId = 10
-            self.reminders = {}
-
-            calendar.update_event(self.id, self.build_event())
-
+        # The click is answered before the calendar is written, which may wait for the rate limit
         if isinstance(interaction, Interaction):
             embed = Embed(
                 title="Rendez-vous annulé!",
@@ -207,94 +940,845 @@ class CalendarEvent():
                 color=Colour.red()
             )
 
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await respond(interaction.response.send_message, embed=embed, ephemeral=True)
+
+        if event:
+            try:
+                if self.id == slot_id(self.calendar.calendar_id, self.start): #type: ignore
+                    # Booking written by Availability.reserve, the slot is free again once it is gone
+                    await self.calendar.delete_event(self.id, self.etag) #type: ignore
+                else:
+                    self.summary = "Créneau libre"
+                    self.description = ""
+                    self.location = ""
+                    self.colorId = 10
+                    self.reminders = {}
+                    self.private = {}
+
+                    await self.save()
+            except EventConflict:
+                # Someone else already took or freed the slot, it isn't ours to free anymore
+                print(f"calendar: {self.id} changed, not freed")
+
+class IntervalSet():
+    # Merged, sorted intervals of timestamps, overlap checks are a binary search
+    def __init__(self, intervals: list[tuple[float, float]]) -> None:
+        self.starts: list[float] = []
+        self.ends: list[float] = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def overlaps(self, start: float, end: float) -> bool:
+        index = bisect.bisect_right(self.ends, start)
+        return index < len(self.starts) and self.starts[index] < end
+
+
+class Availability():
+    # "disponible" blocks (and the "Créneau libre" events created before this engine)
+    # are cut into slots in memory, a calendar event is only written when a slot is booked.
+    SUMMARIES = ("disponible", "Créneau libre")
+
+    def __init__(self, cache: EventCache, slot_length: timedelta, buffer: timedelta) -> None:
+        self.cache = cache
+        self.slot_length = slot_length
+        self.buffer = buffer
+
+    def slot_body(self, start: datetime) -> dict:
+        start = start.astimezone(pytimezone(UTC))
+        return {
+            'id': slot_id(self.cache.calendar.calendar_id, start),
+            'summary': 'Créneau libre',
+            'colorId': 10,
+            'start': {
+                'dateTime': start.isoformat(),
+                'timeZone': UTC
+            },
+            'end': {
+                'dateTime': (start + self.slot_length).isoformat(),
+                'timeZone': UTC
+            }
+        }
+
+    async def slots(self, timeMin: datetime, timeMax: datetime, sync: bool = True) -> list[CalendarEvent]:
+        events = await self.cache.list_events(timeMin, timeMax, sync)
+        busy = IntervalSet([
+            (event_time(event['start']).timestamp(), event_time(event['end']).timestamp())
+            for event in events if event.get('summary') not in self.SUMMARIES
+        ])
+
+        slots: dict[float, dict] = {}
+        for block in events:
+            if block.get('summary') not in self.SUMMARIES:
+                continue
+            start, block_end = event_time(block['start']), event_time(block['end'])
+            while start + self.slot_length <= block_end:
+                end = start + self.slot_length
+                if timeMin < start and end <= timeMax and not busy.overlaps(start.timestamp(), end.timestamp()):
+                    slots[start.timestamp()] = self.slot_body(start)
+                start = end + self.buffer
+
+        return [CalendarEvent(slots[start], self.cache.calendar) for start in sorted(slots)]
+
+    async def is_available(self, start: datetime, sync: bool = True) -> bool:
+        now = datetime.now(pytimezone(UTC))
+        slots = await self.slots(now, start + self.slot_length, sync)
+        return any(slot.start == start for slot in slots)
+
+    async def reserve(self, start: datetime) -> CalendarEvent:
+        body = self.slot_body(start)
+        # The nonce tells our own insert apart when its response was lost and the retry got a 409
+        nonce = secrets.token_hex(8)
+        body.update(
+            summary="En cours de résérvation...",
+            colorId=5,
+            status='confirmed',
+            extendedProperties={'private': {'status': 'reserving', 'nonce': nonce}})
+        try:
+            event = await self.cache.calendar.insert_event(body)
+        except HttpError as error:
+            if error.resp.status != 409:
+                raise
+            # The id is taken: by this very reservation, by a live booking, or by a cancelled one that can be revived
+            existing = await self.cache.calendar.get_event(body['id'])
+            if existing.get('extendedProperties', {}).get('private', {}).get('nonce') == nonce:
+                event = existing
+                self.cache.apply(event)
+            elif existing.get('status') != 'cancelled':
+                raise EventConflict(body['id']) from error
+            else:
+                event = await self.cache.calendar.update_event(body['id'], body, existing.get('etag'))
+        return CalendarEvent(event, self.cache.calendar)
+
+    async def sweep(self, max_age: float) -> int:
+        # Reservations left behind (lost responses, abandoned forms, crashes) free their slot again
+        now = datetime.now(pytimezone("UTC"))
+        stale = [
+            event for event in list(self.cache.events.values())
+            if event.get('extendedProperties', {}).get('private', {}).get('status') == 'reserving'
+            and event.get('updated')
+            and (now - parse_time(event['updated'])).total_seconds() > max_age
+        ]
+        swept = 0
+        for event in stale:
+            try:
+                await self.cache.calendar.delete_event(event['id'], event.get('etag'))
+                swept += 1
+            except EventConflict:
+                # Confirmed in the meantime
+                continue
+        return swept
+
+    async def sweep_loop(self, max_age: float) -> None:
+        while True:
+            await sleep(max_age / 2)
+            try:
+                await self.cache.sync()
+                swept = await self.sweep(max_age)
+                if swept:
+                    print(f"calendar: {swept} stale reservations released")
+            except (CalendarUnavailable, HttpError) as error:
+                print(f"calendar: reservation sweep failed: {error}")
+
+
+class SlotBrowser():
+    # The slot picker, one page per day and at most SELECT_LIMIT times per page, a longer day
+    # is split over numbered pages. The pages are rendered once per slot set: they are reused
+    # until the cache changes or the earliest slot goes by, so browsing is a lookup.
+    def __init__(self, availability: Availability, horizon: timedelta) -> None:
+        self.availability = availability
+        self.horizon = horizon
+        self.version: Union[int, None] = None
+        self.expires = 0.0
+        self.pages: list[tuple[str, list[CalendarEvent]]] = []
+        self.rendered: dict[int, tuple[Embed, list[SelectOption]]] = {}
+        self.lock = asyncio.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def is_current(self) -> bool:
+        return self.version == self.availability.cache.version and time.time() < self.expires
+
+    async def load(self, sync: bool = True) -> list[tuple[str, list[CalendarEvent]]]:
+        if sync:
+            await self.availability.cache.sync()
+        if self.is_current():
+            self.stats['hits'] += 1
+            return self.pages
+        async with self.lock:
+            if self.is_current():
+                self.stats['hits'] += 1
+                return self.pages
+            self.stats['misses'] += 1
+            version = self.availability.cache.version
+            now = datetime.now(pytimezone(UTC))
+            slots = await self.availability.slots(now, now + self.horizon, sync)
+
+            pages: list[tuple[str, list[CalendarEvent]]] = []
+            for day, day_slots in itertools.groupby(slots, key=lambda slot: f"{slot.day} {slot.start.strftime('%d/%m')}"):
+                day_slots = list(day_slots)
+                # A day with more times than a select holds is split, each part gets its own label
+                parts = [day_slots[index:index + SELECT_LIMIT] for index in range(0, len(day_slots), SELECT_LIMIT)]
+                for part, part_slots in enumerate(parts, 1):
+                    pages.append((f"{day} ({part}/{len(parts)})" if len(parts) > 1 else day, part_slots))
+
+            self.pages = pages
+            self.rendered = {}
+            self.version = version
+            # The set also changes when its first slot starts, or when the horizon moves on
+            self.expires = min(
+                slots[0].start.timestamp() if slots else float('inf'),
+                time.time() + self.availability.slot_length.total_seconds())
+            return pages
+
+    def render(self, page: int) -> tuple[Embed, list[SelectOption]]:
+        if page not in self.rendered:
+            label, slots = self.pages[page]
+            embed = Embed(title="Liste des créneaux", color=Colour.blue())
+            embed.add_field(
+                name=label,
+                value='\n'.join(f"{slot.start.strftime('%H:%M')} - {slot.end.strftime('%H:%M')}" for slot in slots))
+            embed.set_footer(text=f"Page {page + 1}/{len(self.pages)} · Fuseau horaire: UTC+01:00")
+            options = [
+                SelectOption(label=f"{slot.start.strftime('%H:%M')} - {slot.end.strftime('%H:%M')}", value=slot.start.isoformat())
+                for slot in slots
+            ]
+            self.rendered[page] = (embed, options)
+        return self.rendered[page]
+
+    def days(self, page: int) -> list[SelectOption]:
+        # A window of SELECT_LIMIT days around the current one
+        first = max(0, min(page - SELECT_LIMIT // 2, len(self.pages) - SELECT_LIMIT))
+        return [
+            SelectOption(label=label, value=str(index), default=index == page)
+            for index, (label, _) in enumerate(self.pages[first:first + SELECT_LIMIT], first)
+        ]
+
+
+class BookingIndex():
+    def __init__(self) -> None:
+        self.channels: dict[int, int] = {} # user id -> rdv channel id
+        self.authors: dict[int, int] = {} # rdv channel id -> user id
+        self.ready = False
+
+    def add(self, user_id: int, channel_id: int) -> None:
+        self.remove_user(user_id)
+        self.remove_channel(channel_id)
+        self.channels[user_id] = channel_id
+        self.authors[channel_id] = user_id
+
+    def remove_user(self, user_id: int) -> None:
+        channel_id = self.channels.pop(user_id, None)
+        if channel_id is not None:
+            self.authors.pop(channel_id, None)
+
+    def remove_channel(self, channel_id: int) -> None:
+        user_id = self.authors.pop(channel_id, None)
+        if user_id is not None:
+            self.channels.pop(user_id, None)
+
+    def get_channel(self, guild, user_id: int) -> Union[TextChannel, None]:
+        if not self.ready:
+            # Still building: a miss could mean a second booking or a duplicate channel, look at the overwrites
+            for channel in guild.text_channels:
+                author = self.author_from_overwrites(channel) if channel.name.startswith("rdv") else None
+                if author and author.id == user_id:
+                    return channel
+            return None
+        channel_id = self.channels.get(user_id)
+        return guild.get_channel(channel_id) if channel_id else None
+
+    def author_from_overwrites(self, channel: TextChannel) -> Union[Member, None]:
+        # Open rdv channels give their author a member overwrite, no API call needed
+        members = [target for target in channel.overwrites if isinstance(target, Member) and not target.bot]
+        return members[0] if len(members) == 1 else None
+
+    async def get_author(self, channel: TextChannel) -> Union[Member, User]:
+        user_id = self.authors.get(channel.id)
+        author = channel.guild.get_member(user_id) if user_id else None
+        if not author:
+            history = await rest("history", channel.id, lambda: channel.history(oldest_first=True, limit=1).flatten())
+            author = history[0].mentions[0]
+            self.add(author.id, channel.id)
+        return author
+
+    async def build(self, guild) -> None:
+        for channel in guild.text_channels:
+            if not channel.name.startswith("rdv"):
+                continue
+            author = self.author_from_overwrites(channel)
+            if author:
+                self.add(author.id, channel.id)
+            else:
+                try:
+                    await self.get_author(channel)
+                except (IndexError, nextcord.HTTPException):
+                    continue
+        self.ready = True
+
+class MeetingStore():
+    # Phases of a meeting: booked -> reminded -> started -> ended, or cancelled
+    def __init__(self, path: str) -> None:
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meetings ("
+            "event_id TEXT PRIMARY KEY, "
+            "guild_id INTEGER, "
+            "channel_id INTEGER, "
+            "message_id INTEGER, "
+            "user_id INTEGER, "
+            "start REAL, "
+            "end REAL, "
+            "phase TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS meetings_end ON meetings (end)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS meetings_channel ON meetings (channel_id)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.commit()
+
+    def get_meta(self, key: str) -> Union[str, None]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+        self.db.commit()
+
+    def save(self, event: CalendarEvent, guild_id: int, channel_id: int, message_id: int, user_id: int, phase: str = "booked") -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO meetings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (event.id, guild_id, channel_id, message_id, user_id, event.start.timestamp(), event.end.timestamp(), phase))
+        self.db.commit()
+
+    def set_phase(self, event_id: str, phase: str) -> None:
+        self.db.execute("UPDATE meetings SET phase = ? WHERE event_id = ?", (phase, event_id))
+        self.db.commit()
+
+    def get(self, event_id: str) -> Union[sqlite3.Row, None]:
+        return self.db.execute("SELECT * FROM meetings WHERE event_id = ?", (event_id,)).fetchone()
+
+    def by_channel(self, channel_id: int) -> Union[sqlite3.Row, None]:
+        return self.db.execute(
+            "SELECT * FROM meetings WHERE channel_id = ? ORDER BY start DESC LIMIT 1", (channel_id,)).fetchone()
+
+    def pending(self, guild_id: Union[int, None] = None) -> list[sqlite3.Row]:
+        query = "SELECT * FROM meetings WHERE end > ? AND phase NOT IN ('ended', 'cancelled')"
+        params: tuple = (time.time(),)
+        if guild_id is not None:
+            query += " AND guild_id = ?"
+            params += (guild_id,)
+        return self.db.execute(query + " ORDER BY start", params).fetchall()
+
+class TranscriptIndex():
+    # Compacted channels by user. It lives in ARCHIVE_DIR next to the transcripts it points to,
+    # so that both survive or go together whatever storage MEETINGS_DB is on.
+    def __init__(self, path: str) -> None:
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "channel_id INTEGER PRIMARY KEY, "
+            "guild_id INTEGER, "
+            "user_id INTEGER, "
+            "name TEXT, "
+            "path TEXT, "
+            "messages INTEGER, "
+            "first REAL, "
+            "last REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS transcripts_user ON transcripts (guild_id, user_id, last)")
+        self.db.commit()
+
+    def add(self, channel_id: int, guild_id: int, user_id: Union[int, None], name: str, path: str, messages: int, first: float, last: float) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (channel_id, guild_id, user_id, name, path, messages, first, last))
+        self.db.commit()
+
+    def by_user(self, guild_id: int, user_id: int) -> list[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT * FROM transcripts WHERE guild_id = ? AND user_id = ? ORDER BY last DESC",
+            (guild_id, user_id)).fetchall()
+
+
+class MeetingScheduler():
+    # One task owns every reminder, start and end of the booked meetings and
+    # only wakes up for the next deadline. Cancelled entries stay in the heap
+    # and are skipped when they come up.
+    def __init__(self) -> None:
+        self.heap: list[tuple[float, int, str, str]] = []
+        self.meetings: dict[str, tuple["Meeting", object, object, PartialInteractionMessage]] = {}
+        self.tokens: dict[str, int] = {}
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        # Running steps are referenced until they finish, the last one of each meeting is
+        # kept so that its next step waits for it
+        self.tasks: set[asyncio.Task] = set()
+        self.running: dict[str, asyncio.Task] = {}
+
+    def spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def schedule(self, meeting: "Meeting", guild, user, message: PartialInteractionMessage, phase: str = "booked") -> None:
+        event = meeting.event
+        token = next(self.counter)
+        self.tokens[event.id] = token
+        self.meetings[event.id] = (meeting, guild, user, message)
+
+        steps = []
+        if phase == "booked":
+            steps.append(((event.start - timedelta(minutes=10)).timestamp(), "remind"))
+        if phase in ("booked", "reminded"):
+            steps.append((event.start.timestamp(), "start_meeting"))
+        steps.append((event.end.timestamp(), "end_meeting"))
+
+        for due, step in steps:
+            heapq.heappush(self.heap, (due, token, event.id, step))
+        self.wakeup.set()
+
+    def reschedule(self, event: dict) -> None:
+        if event['id'] not in self.meetings:
+            return
+        meeting, guild, user, message = self.meetings[event['id']]
+        if event.get('status') == 'cancelled':
+            self.cancel(event['id'])
+            self.spawn(meeting.announce_cancelled(guild))
+            return
+        updated = CalendarEvent(event, meeting.event.calendar)
+        if (updated.start, updated.end) == (meeting.event.start, meeting.event.end):
+            return
+
+        row = meeting_store.get(event['id'])
+        meeting.event = updated
+        self.schedule(meeting, guild, user, message, row['phase'] if row else "booked")
+
+    def cancel(self, event_id: str) -> None:
+        self.tokens.pop(event_id, None)
+        self.meetings.pop(event_id, None)
+        if len(self.heap) > 2 * len(self.tokens) + 64:
+            self.heap = [entry for entry in self.heap if self.tokens.get(entry[2]) == entry[1]]
+            heapq.heapify(self.heap)
+
+    async def run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            due: dict[str, list[str]] = {}
+            while self.heap and self.heap[0][0] <= time.time():
+                _, token, event_id, step = heapq.heappop(self.heap)
+                if self.tokens.get(event_id) == token:
+                    due.setdefault(event_id, []).append(step)
+
+            for event_id, steps in due.items():
+                # After a restart the reminder of a meeting that already started is no use
+                if "remind" in steps and "start_meeting" in steps:
+                    steps.remove("remind")
+                task = self.spawn(self.fire(event_id, steps, self.running.get(event_id)))
+                self.running[event_id] = task
+                task.add_done_callback(lambda task, event_id=event_id: self.running.get(event_id) is task and self.running.pop(event_id))
+
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def fire(self, event_id: str, steps: list[str], previous: Union[asyncio.Task, None] = None) -> None:
+        # Steps of a meeting run in order, after the ones that are still running
+        if previous:
+            await asyncio.wait([previous])
+        for step in steps:
+            if event_id not in self.meetings:
+                return
+            meeting, guild, user, message = self.meetings[event_id]
+            if step == "end_meeting":
+                self.cancel(event_id)
+            try:
+                await getattr(meeting, step)(guild, user, message)
+            except Exception as error:
+                print(f"scheduler: {step} of {event_id} failed: {error}")
+
+class CalendarWatcher():
+    # Google posts to WATCH_ADDRESS whenever the calendar changes and each notification
+    # triggers an incremental sync, so the cache is trusted for WATCH_MAX_STALENESS while
+    # a channel is live. Channels are renewed WATCH_RENEW_MARGIN before they expire.
+    # Without push (no address, no HTTP server, watch refused) the cache is polled instead.
+    def __init__(self, calendar: Calendar, address: str, ttl: int, renew_margin: float, poll_interval: float) -> None:
+        self.calendar = calendar
+        self.address = address
+        self.ttl = ttl
+        self.renew_margin = renew_margin
+        self.poll_interval = poll_interval
+        self.token = secrets.token_urlsafe(24)
+        self.channels: dict[str, dict] = {}
+        self.pending = asyncio.Event()
+        self.stats = {'notifications': 0, 'syncs': 0, 'polls': 0}
+
+    def live(self) -> bool:
+        return any(time.time() < channel['expires'] for channel in self.channels.values())
+
+    def notify(self) -> None:
+        # Bursts of notifications collapse into the next sync
+        self.pending.set()
+
+    async def receive(self, request: web.Request) -> web.Response:
+        headers = request.headers
+        if headers.get('X-Goog-Channel-Token') != self.token or headers.get('X-Goog-Channel-ID') not in self.channels:
+            return web.Response(status=404)
+        # 'sync' only confirms that the channel was created
+        if headers.get('X-Goog-Resource-State') != "sync":
+            self.stats['notifications'] += 1
+            self.notify()
+        return web.Response()
+
+    async def renew(self) -> None:
+        channel_id = str(uuid.uuid4())
+        response = await self.calendar.watch(channel_id, self.address, self.token, self.ttl)
+        expires = int(response.get('expiration', (time.time() + self.ttl) * 1000)) / 1000
+        stale = list(self.channels.items())
+        self.channels = {channel_id: {'resourceId': response['resourceId'], 'expires': expires}}
+        # The new channel is live, the old one can go
+        for old_id, old in stale:
+            try:
+                await self.calendar.stop_channel(old_id, old['resourceId'])
+            except (CalendarUnavailable, HttpError) as error:
+                print(f"watch: couldn't stop channel {old_id}: {error}")
+
+    async def stop(self) -> None:
+        for channel_id, channel in list(self.channels.items()):
+            try:
+                await self.calendar.stop_channel(channel_id, channel['resourceId'])
+            except (CalendarUnavailable, HttpError) as error:
+                print(f"watch: couldn't stop channel {channel_id}: {error}")
+        self.channels.clear()
+
+    async def ingest(self) -> None:
+        while True:
+            await self.pending.wait()
+            self.pending.clear()
+            try:
+                await self.calendar.cache.sync(force=True)
+                self.stats['syncs'] += 1
+            except Exception as error:
+                print(f"watch: sync failed: {error}")
+
+    async def run(self, push: bool = True) -> None:
+        while True:
+            if push and self.address:
+                try:
+                    await self.renew()
+                except (CalendarUnavailable, HttpError) as error:
+                    print(f"watch: push unavailable, polling every {self.poll_interval:.0f}s: {error}")
+
+            if self.live():
+                self.calendar.cache.max_staleness = WATCH_MAX_STALENESS
+                expires = min(channel['expires'] for channel in self.channels.values())
+                await sleep(max(expires - time.time() - self.renew_margin, 1.0))
+            else:
+                self.calendar.cache.max_staleness = CACHE_MAX_STALENESS
+                self.stats['polls'] += 1
+                self.notify()
+                await sleep(self.poll_interval)
+
+
+class Tenant():
+    # One community: its settings, the booking index of its guild and a calendar client with
+    # its own pool, rate limit, breaker and cache, so a slow calendar only slows its own guild
+    def __init__(self, guild_id: int, settings: dict, credentials: CredentialManager) -> None:
+        self.guild_id = guild_id
+        self.client_role_id = int(settings['client_role_id'])
+        self.calendar = Calendar(settings['calendar_id'], credentials, int(settings.get('workers', TENANT_WORKERS)))
+        self.availability = Availability(self.calendar.cache, timedelta(minutes=SLOT_MINUTES), timedelta(minutes=SLOT_BUFFER))
+        self.slot_browser = SlotBrowser(self.availability, timedelta(days=BOOKING_HORIZON_DAYS))
+        self.booking_index = BookingIndex()
+        self.watcher = CalendarWatcher(self.calendar, WATCH_ADDRESS, WATCH_TTL, WATCH_RENEW_MARGIN, POLL_INTERVAL)
+        self.calendar.cache.listeners.append(scheduler.reschedule)
+
+
+class TenantRegistry():
+    # Tenants are built the first time their guild is used, on_load starts their background work.
+    # Tenants sharing a token file share its credentials and their refresh.
+    def __init__(self, settings: dict[int, dict]) -> None:
+        self.settings = settings
+        self.tenants: dict[int, Tenant] = {}
+        self.credentials: dict[str, CredentialManager] = {}
+        self.on_load: list[Callable[[Tenant], None]] = []
+        self.missing: set[str] = set()
+
+    def get(self, guild_id: Union[int, None]) -> Union[Tenant, None]:
+        tenant = self.tenants.get(guild_id) #type: ignore
+        if tenant is None and guild_id in self.settings:
+            settings = self.settings[guild_id]
+            path = settings.get('token_file', GOOGLE_TOKEN_FILE)
+            if path != GOOGLE_TOKEN_FILE and not os.path.exists(path):
+                # GOOGLE_TOKEN is the default community's account, a community with its own
+                # token file waits for that file rather than run on someone else's calendar access
+                if path not in self.missing:
+                    self.missing.add(path)
+                    print(f"tenants: guild {guild_id} not loaded, its token file {path} doesn't exist, "
+                          f"write it with GOOGLE_TOKEN_FILE={path} python auth/log.py")
+                return None
+            self.missing.discard(path)
+            if path not in self.credentials:
+                info = GOOGLE_TOKEN if path == GOOGLE_TOKEN_FILE else None
+                self.credentials[path] = CredentialManager(path, info, SCOPES)
+            tenant = Tenant(guild_id, settings, self.credentials[path]) #type: ignore
+            self.tenants[guild_id] = tenant #type: ignore
+            for callback in self.on_load:
+                callback(tenant)
+        return tenant
+
+    def loaded(self, guild_id: Union[int, None]) -> Union[Tenant, None]:
+        # Without loading it, for events that don't need a tenant that isn't in use yet
+        return self.tenants.get(guild_id) #type: ignore
+
+    async def receive(self, request: web.Request) -> web.Response:
+        channel_id = request.headers.get('X-Goog-Channel-ID')
+        for tenant in self.tenants.values():
+            if channel_id in tenant.watcher.channels:
+                return await tenant.watcher.receive(request)
+        return web.Response(status=404)
+
+
+class ArchiveCompactor():
+    # Archived rdv channels are streamed to ARCHIVE_DIR/<guild>/<channel>.jsonl.gz, indexed by
+    # user in ARCHIVE_DIR/index.db, then deleted a few at a time: Discord caps a category at 50
+    # channels and a returning client's context comes from the index instead. Opt-in through
+    # ARCHIVE_INTERVAL: the transcripts are the only copy left, ARCHIVE_DIR must survive restarts.
+    def __init__(self, directory: str, after: timedelta, batch: int, pause: float) -> None:
+        self.directory = directory
+        self._index: Union[TranscriptIndex, None] = None
+        self.after = after
+        self.batch = batch
+        self.pause = pause
+        self.stats = {'channels': 0, 'messages': 0}
+
+    @property
+    def index(self) -> TranscriptIndex:
+        # Opened on first use, ARCHIVE_DIR isn't created for nothing when compaction is off
+        if self._index is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._index = TranscriptIndex(os.path.join(self.directory, "index.db"))
+        return self._index
+
+    def last_activity(self, channel: TextChannel) -> datetime:
+        if channel.last_message_id:
+            return utils.snowflake_time(channel.last_message_id)
+        return channel.created_at
+
+    def record(self, message) -> dict:
+        return {
+            'id': message.id,
+            'author_id': message.author.id,
+            'author': str(message.author),
+            'created_at': message.created_at.isoformat(),
+            'content': message.content,
+            'embeds': [embed.to_dict() for embed in message.embeds],
+            'attachments': [attachment.url for attachment in message.attachments],
+        }
+
+    async def export(self, tenant: "Tenant", channel: TextChannel) -> Union[int, None]:
+        # Returns the id of the last message exported
+        user_id = tenant.booking_index.authors.get(channel.id)
+        if user_id is None:
+            row = meeting_store.by_channel(channel.id)
+            user_id = row['user_id'] if row else None
+
+        folder = os.path.join(self.directory, str(channel.guild.id))
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{channel.id}.jsonl.gz")
+        loop = asyncio.get_running_loop()
+        # Compression runs off the event loop, one page of history at a time
+        transcript = await loop.run_in_executor(None, lambda: gzip.open(f"{path}.tmp", "wt", encoding="utf-8"))
+        messages, first, last, last_id = 0, None, None, None
+        try:
+            lines: list[str] = []
+            with metrics.span("discord.export_history"):
+                async for message in channel.history(limit=None, oldest_first=True):
+                    lines.append(json.dumps(self.record(message), ensure_ascii=False))
+                    messages += 1
+                    first = first or message.created_at
+                    last = message.created_at
+                    last_id = message.id
+                    if len(lines) == 100:
+                        await loop.run_in_executor(None, transcript.write, "\n".join(lines) + "\n")
+                        lines = []
+            if lines:
+                await loop.run_in_executor(None, transcript.write, "\n".join(lines) + "\n")
+        finally:
+            await loop.run_in_executor(None, transcript.close)
+        os.replace(f"{path}.tmp", path)
+
+        created = channel.created_at.timestamp()
+        self.index.add(
+            channel.id, channel.guild.id, user_id, channel.name, path, messages,
+            first.timestamp() if first else created, last.timestamp() if last else created)
+        self.stats['messages'] += messages
+        return last_id
+
+    async def compact(self, tenant: "Tenant", guild) -> int:
+        archives = utils.get(guild.categories, name="Archives")
+        if not archives:
+            return 0
+        cutoff = datetime.now(pytimezone("UTC")) - self.after
+        channels = [
+            channel for channel in archives.channels
+            if isinstance(channel, TextChannel) and channel.name.startswith("rdv") and self.last_activity(channel) < cutoff
+        ]
+
+        compacted = 0
+        for index, channel in enumerate(channels):
+            # Deletions share one route bucket, leave room for the bookings in between batches
+            if index and index % self.batch == 0:
+                await sleep(self.pause)
+            try:
+                last_id = await self.export(tenant, channel)
+                # The export takes a while: a client may have rebooked, moving the channel out of
+                # Archives, or written in it since. Only what was exported is deleted.
+                current = await rest("fetch_channel", guild.id, guild.fetch_channel, channel.id)
+                if current.category_id != archives.id or current.last_message_id != last_id:
+                    print(f"archives: {channel.name} changed during its export, kept")
+                    continue
+                await rest("delete_channel", channel.id, current.delete, reason="Rendez-vous archivé")
+            except (nextcord.HTTPException, OSError) as error:
+                print(f"archives: couldn't compact {channel.name}: {error}")
+                continue
+            compacted += 1
+            self.stats['channels'] += 1
+        return compacted
+
+    def context(self, guild_id: int, user_id: int) -> Union[tuple[Embed, File], None]:
+        if not os.path.exists(os.path.join(self.directory, "index.db")):
+            return None
+        transcripts = self.index.by_user(guild_id, user_id)
+        if not transcripts:
+            return None
+        embed = Embed(title="Rendez-vous précédents", colour=Colour.dark_theme())
+        embed.description = "\n".join(
+            f"{datetime.fromtimestamp(transcript['first'], pytimezone(UTC)).strftime('%d/%m/%Y')}: {transcript['messages']} messages"
+            for transcript in transcripts[:10])
+        latest = transcripts[0]
+        if not os.path.exists(latest['path']):
+            return None
+        return embed, File(latest['path'], filename=f"{latest['name']}.jsonl.gz")
+
+
+meeting_store = MeetingStore(MEETINGS_DB)
+archive_compactor = ArchiveCompactor(ARCHIVE_DIR, timedelta(days=ARCHIVE_AFTER_DAYS), ARCHIVE_BATCH, ARCHIVE_PAUSE)
+scheduler = MeetingScheduler()
+tenants = TenantRegistry(TENANTS)
+
+
+class CalendarView(ui.View):
+    async def on_error(self, error: Exception, item: ui.Item, interaction: Interaction) -> None:
+        if isinstance(error, CalendarUnavailable):
+            await send_unavailable(interaction)
+        else:
+            await super().on_error(error, item, interaction)
 
-calendar = Calendar()
             
-class TakeMeetingView(ui.View):
+class TakeMeetingView(CalendarView):
     def __init__(self):
         super().__init__(timeout=None)
         self.dropdown: ui.Select
 
+    @metrics.timed("view.take_meeting")
     async def take_meeting(self, interaction: Interaction):
-        await interaction.response.defer(ephemeral=True)
-        now = datetime.now(pytimezone(UTC)) # 'Z' indicates UTC time
-        events_result = calendar.list_events(now, now + timedelta(days=7))
-        events = events_result.get('items', [])
-
-        slots: dict[str, list[CalendarEvent]] = {}
+        await respond(interaction.response.defer, ephemeral=True)
+        tenant: Tenant = tenants.get(interaction.guild_id) #type: ignore
 
-        for event in events:
-            events = CalendarEvent(event)
-            if events.summary == "disponible":
-                events = events.split_disponible()
-                for splited_event in events:
-                    splited_event: CalendarEvent
-                    if splited_event.start > datetime.now(pytimezone(UTC)):
-                        if splited_event.day not in slots:
-                            slots[splited_event.day] = []
-                        slots[splited_event.day].append(splited_event)
-            elif events.summary == "Créneau libre" and events.start > datetime.now(pytimezone(UTC)):
-                if events.day not in slots:
-                    slots[events.day] = []
-                slots[events.day].append(events)
-
-        if slots:
-            embed = Embed(
-                title="Liste des créneaux",
-                color=Colour.blue()
-            )
-            options: list[SelectOption] = []
-            id = 1
-            for day in slots:
-                day_slots: list[str] = []
-                for slot in slots[day]:
-                    options.append(SelectOption(label=f"{id}", value=slot.id))
-                    day_slots.append(f"{id}. {slot.start.strftime('%H:%M')} - {slot.end.strftime('%H:%M')}")
-                    id += 1
-                embed.add_field(name=day, value='\n'.join(day_slots), inline=True)
-
-            embed.set_footer(text="Fuseau horaire: UTC+01:00")
-
-            await interaction.followup.send(embed=embed, view=TimeSlotsView(options), ephemeral=True)
+        if await tenant.slot_browser.load():
+            embed, _ = tenant.slot_browser.render(0)
+            await rest("followup", interaction.token, interaction.followup.send, embed=embed, view=TimeSlotsView(tenant, 0), ephemeral=True)
         else:
             embed = Embed(
                 title="Aucun créneau disponible pour le moment",
                 color=Colour.red()
             )
-            await interaction.followup.send(embed=embed, ephemeral=True)
+            await rest("followup", interaction.token, interaction.followup.send, embed=embed, ephemeral=True)
 
     @ui.button(label="Prendre un RDV", style=ButtonStyle.primary, custom_id="meeting_view:primary")
+    @metrics.timed("view.take_meeting_button")
     async def callback(self, button: Union[ui.Button, None], interaction: Interaction) -> None:
-        for channel in interaction.channel.category.channels: #type: ignore
-            if channel.name.startswith("rdv"):
-                author = await MeetingView(CalendarEvent({})).get_meeting_author(channel) #type: ignore
-                if author == interaction.user and interaction.guild.get_role(CLIENT_ROLE_ID) not in interaction.user.roles: #type: ignore
-                    embed = Embed(
-                        title="Vous avez déja pris un rendez-vous",
-                        color=Colour.red()
-                    )
-                    await interaction.response.send_message(embed=embed, ephemeral=True)
-                    return
-
-        if interaction.guild.get_role(CLIENT_ROLE_ID) in interaction.user.roles: #type: ignore
+        tenant: Tenant = tenants.get(interaction.guild_id) #type: ignore
+        channel = tenant.booking_index.get_channel(interaction.guild, interaction.user.id) #type: ignore
+        if channel and channel.category == interaction.channel.category and interaction.guild.get_role(tenant.client_role_id) not in interaction.user.roles: #type: ignore
+            embed = Embed(
+                title="Vous avez déja pris un rendez-vous",
+                color=Colour.red()
+            )
+            await respond(interaction.response.send_message, embed=embed, ephemeral=True)
+            return
+
+        if interaction.guild.get_role(tenant.client_role_id) in interaction.user.roles: #type: ignore
             embed = Embed(
                 title="Engagement", description="En cliquant sur accepter vous vous engager a payer la somme apres le rendez-vous", colour=Colour.blue())
-            await interaction.response.send_message(embed=embed, view=AcceptConditionsView(), ephemeral=True)
+            await respond(interaction.response.send_message, embed=embed, view=AcceptConditionsView(), ephemeral=True)
         else:    
             await self.take_meeting(interaction)
 
 
-class TimeSlotsView(ui.View):
-    def __init__(self, options):
+class TimeSlotsView(CalendarView):
+    def __init__(self, tenant: Tenant, page: int):
         super().__init__(timeout=60)
+        self.tenant = tenant
+        self.page = page
 
+        browser = tenant.slot_browser
+        _, options = browser.render(page)
         self.add_item(TimeSlotsDropdown(options))
+        if len(browser.pages) > 1:
+            self.add_item(DaysDropdown(browser.days(page)))
+        self.previous_day.disabled = page == 0
+        self.next_day.disabled = page == len(browser.pages) - 1
+
+    async def show(self, interaction: Interaction, page: int) -> None:
+        # Turning a page answers from the cache, a sync could wait on the calendar rate limit past
+        # Discord's 3 seconds. Taking a slot checks it against the calendar anyway.
+        pages = await self.tenant.slot_browser.load(sync=False)
+        if not pages:
+            embed = Embed(title="Aucun créneau disponible pour le moment", color=Colour.red())
+            await respond(interaction.response.edit_message, embed=embed, view=None)
+            self.stop()
+            return
+        # The slot set may have shrunk since this page was sent
+        page = max(0, min(page, len(pages) - 1))
+        embed, _ = self.tenant.slot_browser.render(page)
+        await respond(interaction.response.edit_message, embed=embed, view=TimeSlotsView(self.tenant, page))
+        self.stop()
+
+    @ui.button(label="Jour précédent", style=ButtonStyle.secondary, row=2)
+    @metrics.timed("view.previous_day")
+    async def previous_day(self, button: ui.Button, interaction: Interaction) -> None:
+        await self.show(interaction, self.page - 1)
+
+    @ui.button(label="Jour suivant", style=ButtonStyle.secondary, row=2)
+    @metrics.timed("view.next_day")
+    async def next_day(self, button: ui.Button, interaction: Interaction) -> None:
+        await self.show(interaction, self.page + 1)
 
     async def on_timeout(self) -> None:
         return await super().on_timeout()
 
 
+class DaysDropdown(ui.Select):
+    def __init__(self, options):
+        super().__init__(
+            placeholder="Choisissez un jour...",
+            min_values=1,
+            max_values=1,
+            options=options,
+            row=1,
+        )
+
+    @metrics.timed("view.select_day")
+    async def callback(self, interaction: Interaction) -> None:
+        await self.view.show(interaction, int(self.values[0])) #type: ignore
+
+
 class TimeSlotsDropdown(ui.Select):
     def __init__(self, options):
         super().__init__(
@@ -302,46 +1786,68 @@ class TimeSlotsDropdown(ui.Select):
             min_values=1,
             max_values=1,
             options=options,
+            row=0,
         )
 
+    @metrics.timed("view.select_slot")
     async def callback(self, interaction: Interaction) -> None:
-        event = CalendarEvent(calendar.get_event(self.values[0]))
+        start = datetime.fromisoformat(self.values[0])
+        tenant: Tenant = self.view.tenant #type: ignore
+        self.view.stop() # type: ignore
+
+        if interaction.guild.get_role(tenant.client_role_id) not in interaction.user.roles: #type: ignore
+            # The form comes first and the slot is only reserved once it is submitted, so an
+            # abandoned or expired form holds nothing. Until then the cache is enough to tell.
+            if await tenant.availability.is_available(start, sync=False):
+                await respond(interaction.response.send_modal, Form(tenant, start))
+                return
+            await respond(interaction.response.defer, ephemeral=True)
+            await send_taken(interaction, tenant)
+            return
 
-        if interaction.guild.get_role(CLIENT_ROLE_ID) in interaction.user.roles: #type: ignore
-            await interaction.response.defer(ephemeral=True)
-        if event.check_event():
-            event.summary = "En cours de résérvation..." 
-            event.colorId = 5
+        await respond(interaction.response.defer, ephemeral=True)
+        event = await reserve_slot(tenant, start)
+        if not event:
+            await send_taken(interaction, tenant)
+            return
+        await send_confirmation(interaction, event, [str(interaction.user.id)])
 
-            event = CalendarEvent(calendar.update_event(event.id, event.build_event()))
-            
-            if interaction.guild.get_role(CLIENT_ROLE_ID) not in interaction.user.roles: #type: ignore
-                await interaction.response.send_modal(Form(event))
-                self.view.stop() # type: ignore
-            else:
 
-                starting_time = event.start.strftime("%H:%M")
-                ending_time = event.end.strftime("%H:%M")
+async def reserve_slot(tenant: Tenant, start: datetime) -> Union[CalendarEvent, None]:
+    if not await tenant.availability.is_available(start):
+        return None
+    try:
+        return await tenant.availability.reserve(start)
+    except EventConflict:
+        return None
 
-                embed = Embed(title="Voulez vous confirmer?",
-                            description=f"Etes vous sur de vouloir reserver le rendez-vous de {event.day} de {starting_time} a {ending_time}?",
-                            color=Colour.blue())
 
-                await interaction.followup.send(embed=embed, view=ConfirmMeetingView(event, [str(interaction.user.id)]), ephemeral=True)
-                self.view.stop() # type: ignore
-        else:
-            if interaction.guild.get_role(CLIENT_ROLE_ID) not in interaction.user.roles: #type: ignore
-                await interaction.response.defer(ephemeral=True)
-            embed = Embed(
-                title="Le créneau que vous avez choisi n'est plus disponible",
-                description="Voulez vous choisir un nouveau?",
-                color=Colour.red()
-            )
-            await interaction.followup.send(embed=embed, view=RetakeMeetingView(event), ephemeral=True)
-            self.view.stop() #type: ignore
+async def send_confirmation(interaction: Interaction, event: CalendarEvent, infos: list) -> None:
+    starting_time = event.start.strftime("%H:%M")
+    ending_time = event.end.strftime("%H:%M")
+
+    embed = Embed(title="Voulez vous confirmer?",
+                description=f"Etes vous sur de vouloir reserver le rendez-vous de {event.day} de {starting_time} a {ending_time}?",
+                color=Colour.blue())
+
+    try:
+        await rest("followup", interaction.token, interaction.followup.send, embed=embed, view=ConfirmMeetingView(event, infos), ephemeral=True)
+    except Exception:
+        # Nobody can confirm this reservation, it is freed now rather than by the sweeper
+        await event.cancel_meeting()
+        raise
+
+
+async def send_taken(interaction: Interaction, tenant: Tenant) -> None:
+    embed = Embed(
+        title="Le créneau que vous avez choisi n'est plus disponible",
+        description="Voulez vous choisir un nouveau?",
+        color=Colour.red()
+    )
+    await rest("followup", interaction.token, interaction.followup.send, embed=embed, view=RetakeMeetingView(CalendarEvent({}, tenant.calendar)), ephemeral=True)
 
 class Form(ui.Modal):
-    def __init__(self, event: CalendarEvent):
+    def __init__(self, tenant: Tenant, start: datetime):
         super().__init__("Formulaire", timeout=60*5)
 
         self.summary = ui.TextInput(
@@ -385,8 +1891,10 @@ class Form(ui.Modal):
         )
         self.add_item(self.description)
 
-        self.event = event
+        self.tenant = tenant
+        self.start = start
 
+    @metrics.timed("view.form")
     async def callback(self, interaction: Interaction) -> None:
         values = [
             strip_tags(self.summary.value).replace("\n", " ").replace("\\n", " "),
@@ -396,23 +1904,22 @@ class Form(ui.Modal):
             strip_tags(self.description.value).replace("\n", " ").replace("\\n", " "),
             str(interaction.user.id) #type: ignore
         ]
-
-        starting_time = self.event.start.strftime("%H:%M")
-        ending_time = self.event.end.strftime("%H:%M")
-
-        embed = Embed(
-            title="Voulez vous confirmer?",
-            description=f"Etes vous sur de vouloir reserver le rendez-vous de {self.event.day} de {starting_time} a {ending_time}?",
-            color=Colour.blue())
-        
-        await interaction.response.send_message(embed=embed, view=ConfirmMeetingView(self.event, values), ephemeral=True)
         self.stop()
 
-    async def on_timeout(self):
-        await self.event.cancel_meeting()
-        self.stop()
+        await respond(interaction.response.defer, ephemeral=True)
+        event = await reserve_slot(self.tenant, self.start)
+        if not event:
+            await send_taken(interaction, self.tenant)
+            return
+        await send_confirmation(interaction, event, values)
 
-class ConfirmMeetingView(ui.View):
+    async def on_error(self, error: Exception, interaction: Interaction) -> None:
+        if isinstance(error, CalendarUnavailable):
+            await send_unavailable(interaction)
+        else:
+            await super().on_error(error, interaction)
+
+class ConfirmMeetingView(CalendarView):
     def __init__(self, event: CalendarEvent, infos: list = []):
         super().__init__(timeout = 60)
         self.value = None
@@ -423,12 +1930,14 @@ class ConfirmMeetingView(ui.View):
     # stop the View from listening to more input.
     # We also send the user an ephemeral message that we're confirming their choice.
     @ui.button(label="Confirmer", style=ButtonStyle.green)
+    @metrics.timed("view.confirm_meeting")
     async def confirm(self, button: ui.Button, interaction: Interaction) -> None:  
-        await interaction.response.defer(ephemeral=True)
+        await respond(interaction.response.defer, ephemeral=True)
         description = "\n\n".join([info for info in self.infos if info])
 
         user = interaction.user
         interaction_channel = interaction.channel 
+        tenant: Tenant = tenants.get(interaction.guild_id) #type: ignore
 
         self.event.summary = f"Rendez-vous ({interaction.user})"
         self.event.description = description
@@ -440,44 +1949,6 @@ class ConfirmMeetingView(ui.View):
         ], 
         }
 
-        channel = None
-        content = interaction.user.mention #type: ignore
-        meetView = MeetingView(self.event)
-        message = None
-        for rdv_channel in interaction_channel.category.channels: #type: ignore
-            if str(rdv_channel.name)[:3] == "rdv":
-                author = await MeetingView(CalendarEvent({})).get_meeting_author(rdv_channel)  #type: ignore
-                if author == user:
-                    channel = rdv_channel
-                    meetView = None
-                    content = "@here"
-                    history = await channel.history(oldest_first=True, limit=1).flatten() #type: ignore
-                    message = history[0]  
-                    await message.edit(view=MeetingView(self.event))
-
-        for rdv_channel in utils.get(interaction_channel.guild.categories, name="Archives").channels: #type: ignore
-            if str(rdv_channel.name)[:3] == "rdv":
-                author = await MeetingView(CalendarEvent({})).get_meeting_author(rdv_channel) #type: ignore
-                if author == user:
-                    channel = rdv_channel
-                    meetView = None
-                    content = "@here"
-                    await channel.edit(category=interaction_channel.category, sync_permissions=True) #type: ignore
-                    await channel.set_permissions(author, view_channel=True) #type: ignore
-                    await channel.purge(limit=1)  #type: ignore
-                    history = await channel.history(oldest_first=True, limit=1).flatten()  #type: ignore
-                    message = history[0]
-                    await message.edit(view=MeetingView(self.event)) 
-
-        if not channel:
-            channel = await interaction_channel.guild.create_text_channel(name=f"rdv-{str(user).replace(' ', '')}", category=interaction_channel.category) #type: ignore
-            #type: ignore
-            await channel.set_permissions(user, view_channel=True) #type: ignore
-            
-
-        self.event.location = channel.id
-        calendar.update_event(self.event.id, self.event.build_event())
-
         embed = Embed(
                 title=f"Rendez-vous de {user}",
                 description=f"{self.event.day} de {self.event.start.strftime('%H:%M')} a {self.event.end.strftime('%H:%M')}",
@@ -485,28 +1956,112 @@ class ConfirmMeetingView(ui.View):
             )
         embed.set_footer()
 
-        
-        
-        msg = await channel.send(content, view=meetView, embed=embed) #type: ignore
-        await msg.pin()
-        embed = Embed(
+        done = Embed(
                 title="Rendez-vous pris!",
                 description="Le rendez-vous a bien été reservé!",
                 color=Colour.green()
             )
 
-        await interaction.followup.send(embed=embed, ephemeral=True)
-        self.value = True
+        # The slot is ours but still 'reserving' until the single calendar write below, which
+        # needs the channel and its message: channel, message, then everything else at once.
+        # The user is only told once it is all persisted, our own rollback replaces the view's
+        # timeout from here on.
         self.stop()
+        msg, created = None, None
+        try:
+            channel = None
+            content = interaction.user.mention #type: ignore
+            message = None
+            category = interaction_channel.category #type: ignore
+            overwrites = overwrites_for(category, user, view_channel=True)
+            rdv_channel = tenant.booking_index.get_channel(interaction_channel.guild, user.id) #type: ignore
+            if rdv_channel and rdv_channel.category == category: #type: ignore
+                channel = rdv_channel
+                content = "@here"
+                message = await self.first_message(channel)
+
+            elif rdv_channel and rdv_channel.category == utils.get(interaction_channel.guild.categories, name="Archives"): #type: ignore
+                channel = rdv_channel
+                content = "@here"
+                _, _, message = await asyncio.gather(
+                    rest("edit_channel", channel.id, channel.edit, category=category, overwrites=overwrites), #type: ignore
+                    rest("purge", channel.id, channel.purge, limit=1), #type: ignore
+                    self.first_message(channel))
+
+            context = None
+            if not channel:
+                # A returning client whose channel was compacted gets their history back from the index
+                context = archive_compactor.context(interaction_channel.guild.id, user.id) #type: ignore
+                channel = created = await rest("create_channel", interaction_channel.guild.id, interaction_channel.guild.create_text_channel, name=f"rdv-{str(user).replace(' ', '')}", category=category, overwrites=overwrites) #type: ignore
+                tenant.booking_index.add(user.id, channel.id) #type: ignore
+
+            # Sent without a view: Messageable.send stores any view it is given, stopped or not,
+            # the buttons are put on the meeting message by schedule_alert's edit
+            msg = await rest("send_message", channel.id, channel.send, content, embed=embed) #type: ignore
+
+            if not message:
+                message = msg
+
+            self.event.location = channel.id
+            self.event.private.update(user=str(user.id), channel=str(channel.id), message=str(message.id), status="booked") #type: ignore
+            meeting_store.save(self.event, interaction_channel.guild.id, channel.id, message.id, user.id) #type: ignore
+            calls = [
+                self.event.save(),
+                rest("pin", msg.channel.id, msg.pin),
+                Meeting(tenant, self.event).schedule_alert(interaction_channel.guild, user, message), #type: ignore
+            ]
+            if context:
+                # After the meeting message, which stays the first of the channel
+                context_embed, transcript = context
+                calls.append(rest("send_message", channel.id, channel.send, embed=context_embed, file=transcript))
+            await asyncio.gather(*calls)
+        except Exception as error:
+            print(f"meetings: booking {self.event.id} failed, rolled back: {error!r}")
+            await self.rollback(msg, created)
+            if isinstance(error, EventConflict):
+                embed = Embed(
+                    title="Le créneau que vous avez choisi n'est plus disponible",
+                    color=Colour.red()
+                )
+            else:
+                embed = Embed(
+                    title="Le rendez-vous n'a pas pu être reservé",
+                    description="Veuillez réessayer dans quelques instants",
+                    color=Colour.red()
+                )
+            await rest("followup", interaction.token, interaction.followup.send, embed=embed, ephemeral=True)
+            self.value = False
+            return
 
-        if not message:
-            message = msg
-
-        await MeetingView(self.event).schedule_alert(interaction_channel.guild, user, message) #type: ignore
-            
+        self.value = True
+        await rest("followup", interaction.token, interaction.followup.send, embed=done, ephemeral=True)
+
+    async def first_message(self, channel: TextChannel) -> nextcord.PartialMessage:
+        # The meeting message of a known channel is in the store, its history is only read for older channels
+        row = meeting_store.by_channel(channel.id)
+        if row and row['message_id']:
+            return channel.get_partial_message(row['message_id'])
+        history = await rest("history", channel.id, lambda: channel.history(oldest_first=True, limit=1).flatten())
+        return history[0]
+
+    async def rollback(self, msg: Union[nextcord.Message, None], created: Union[TextChannel, None]) -> None:
+        # Frees the slot and forgets the meeting, each step on its own so one failure doesn't keep the others
+        meeting_store.set_phase(self.event.id, "cancelled") #type: ignore
+        scheduler.cancel(self.event.id) #type: ignore
+        steps = [self.event.cancel_meeting()]
+        if created is not None:
+            # A channel without its meeting message would break the next booking of this user
+            steps.append(rest("delete_channel", created.id, created.delete, reason="Rendez-vous non reservé"))
+        elif msg is not None:
+            steps.append(rest("delete_message", msg.channel.id, msg.delete))
+        for result in await asyncio.gather(*steps, return_exceptions=True):
+            if isinstance(result, Exception):
+                # A slot still 'reserving' is freed by the sweeper
+                print(f"meetings: rollback of {self.event.id} incomplete: {result!r}")
 
     # This one is similar to the confirmation button except sets the inner value to `False`
     @ui.button(label="Annuler", style=ButtonStyle.danger)
+    @metrics.timed("view.cancel_confirmation")
     async def cancel(self, button: ui.Button, interaction: Interaction) -> None:
         await self.event.cancel_meeting(interaction)
         self.value = False
@@ -519,85 +2074,131 @@ class ConfirmMeetingView(ui.View):
 
 
 class MeetingView(ui.View):
-    def __init__(self, event: CalendarEvent):
+    # Only renders the buttons of a meeting message. Their custom_id carries the event id
+    # and clicks are dispatched by Meetings.on_interaction, so the view is stopped and only
+    # ever attached through an edit, which doesn't store stopped views (send stores them all):
+    # memory doesn't grow with the bookings and the buttons keep working after a restart.
+    PREFIX = "meeting"
+
+    def __init__(self, event_id: str, state: str = "booked"):
         super().__init__(timeout=None)
+        self.add_item(ui.Button(
+            label="Reprendre un RDV",
+            style=ButtonStyle.primary,
+            custom_id=f"{self.PREFIX}:retake:{event_id}",
+            disabled=state != "ended"))
+        self.add_item(ui.Button(
+            label="Fermer",
+            style=ButtonStyle.red,
+            custom_id=f"{self.PREFIX}:close:{event_id}",
+            disabled=state == "closed"))
+        self.stop()
+
+
+class Meeting():
+    def __init__(self, tenant: Tenant, event: CalendarEvent):
+        self.tenant = tenant
         self.event = event
 
-    async def schedule_alert(self, guild, user, message: PartialInteractionMessage) -> None: 
-        await message.edit(view=self)
-        wait = int((self.event.start-(datetime.now(pytimezone(UTC)))).total_seconds())
-        if wait > 600:
-            await sleep(wait - 600)
-        if self.event.location:
-            rdv_channel = guild.get_channel(int(self.event.location))
-
-            if str(rdv_channel.category) == "Rendez-vous":  
-                if self.event.check_event():
-                    wait = int(
-                        (self.event.start-(datetime.now(pytimezone(UTC)))).total_seconds())
-                    embed = Embed(
-                            title=f"Le rendez-vous est dans {int(math.ceil(wait / 60))} minutes",
-                            color=Colour.blue()
-                        )
-
-                    await rdv_channel.send("@here", embed=embed) 
-                    await sleep(wait)
-                else:   
-                    embed = Embed(
-                        title="Le rendez-vous a été annulé",
-                        color=Colour.red()
-                    )
-                    await rdv_channel.send("@here", embed=embed)  
-            else:
-                await self.event.cancel_meeting()
-                return
+    @classmethod
+    async def resolve(cls, tenant: Tenant, event_id: str) -> "Meeting":
+        # Scheduled meetings are already in memory, anything else is read back from the calendar
+        if event_id in scheduler.meetings:
+            return scheduler.meetings[event_id][0]
+        event = await tenant.calendar.cache.get_event(event_id) if event_id else None
+        if not event and event_id:
+            try:
+                event = await tenant.calendar.get_event(event_id)
+            except HttpError as error:
+                if error.resp.status not in (404, 410):
+                    raise
+        return cls(tenant, CalendarEvent(event or {}, tenant.calendar))
+
+    async def schedule_alert(self, guild, user, message: PartialInteractionMessage, phase: str = "booked") -> None: 
+        await rest("edit_message", message.channel.id, message.edit, view=MeetingView(self.event.id))
+        scheduler.schedule(self, guild, user, message, phase)
+
+    async def remind(self, guild, user, message: PartialInteractionMessage) -> None:
+        rdv_channel = await self.get_meeting_channel(guild)
+        if not rdv_channel:
+            return
+
+        if await self.event.check_event():
+            wait = int(
+                (self.event.start-(datetime.now(pytimezone(UTC)))).total_seconds())
+            embed = Embed(
+                    title=f"Le rendez-vous est dans {int(math.ceil(wait / 60))} minutes",
+                    color=Colour.blue()
+                )
+
+            await rest("send_message", rdv_channel.id, rdv_channel.send, "@here", embed=embed)
+            meeting_store.set_phase(self.event.id, "reminded")
         else:
-            await self.event.cancel_meeting()
+            await self.cancelled(rdv_channel)
+
+    async def start_meeting(self, guild, user, message: PartialInteractionMessage) -> None:
+        rdv_channel = await self.get_meeting_channel(guild)
+        if not rdv_channel:
             return
-        
 
-        if self.event.location:
-            rdv_channel = guild.get_channel(int(self.event.location))
-
-            if str(rdv_channel.category) == "Rendez-vous":  
-                if self.event.check_event():
-                    embed = Embed(
-                        title="Le rendez-vous a commencé",
-                        color=Colour.green()
-                    )
-
-                    await rdv_channel.send("@here", embed=embed) 
-                    await user.add_roles(guild.get_role(CLIENT_ROLE_ID))  
-                    wait = int((self.event.end-(datetime.now(pytimezone(UTC)))).total_seconds())
-                    await sleep(wait)
-                    embed = Embed(
-                        title="Le rendez-vous est fini",
-                        color=Colour.red()
-                    )
-
-                    await rdv_channel.send("@here", embed=embed) 
-                    for button in self.children:
-                        button.disabled = False  #type: ignore
-                    await message.edit(view=self)  
-                else:
-                    embed = Embed(
-                        title="Le rendez-vous a été annulé",
-                        color=Colour.red()
-                    )
+        if await self.event.check_event():
+            embed = Embed(
+                title="Le rendez-vous a commencé",
+                color=Colour.green()
+            )
 
-                    await rdv_channel.send("@here", embed=embed) 
-            else:
-                await self.event.cancel_meeting()
-                return
+            await rest("send_message", rdv_channel.id, rdv_channel.send, "@here", embed=embed)
+            await rest("add_roles", guild.id, user.add_roles, guild.get_role(self.tenant.client_role_id))
+            meeting_store.set_phase(self.event.id, "started")
         else:
-            await self.event.cancel_meeting()
+            await self.cancelled(rdv_channel)
+
+    async def end_meeting(self, guild, user, message: PartialInteractionMessage) -> None:
+        channel_id = self.event.private.get('channel') or self.event.location
+        rdv_channel = guild.get_channel(int(channel_id)) if channel_id else None
+        if not rdv_channel:
             return
 
+        embed = Embed(
+            title="Le rendez-vous est fini",
+            color=Colour.red()
+        )
+
+        await rest("send_message", rdv_channel.id, rdv_channel.send, "@here", embed=embed)
+        meeting_store.set_phase(self.event.id, "ended")
+        await rest("edit_message", message.channel.id, message.edit, view=MeetingView(self.event.id, "ended"))
+
+    async def cancelled(self, rdv_channel: TextChannel) -> None:
+        embed = Embed(
+            title="Le rendez-vous a été annulé",
+            color=Colour.red()
+        )
+
+        await rest("send_message", rdv_channel.id, rdv_channel.send, "@here", embed=embed)
+        meeting_store.set_phase(self.event.id, "cancelled")
+        scheduler.cancel(self.event.id)
+
+    async def announce_cancelled(self, guild) -> None:
+        channel_id = self.event.private.get('channel') or self.event.location
+        rdv_channel = guild.get_channel(int(channel_id)) if channel_id else None
+        if rdv_channel:
+            await self.cancelled(rdv_channel)
+        else:
+            meeting_store.set_phase(self.event.id, "cancelled")
+
+    async def get_meeting_channel(self, guild) -> Union[TextChannel, None]:
+        channel_id = self.event.private.get('channel') or self.event.location
+        rdv_channel = guild.get_channel(int(channel_id)) if channel_id else None
+        if rdv_channel and str(rdv_channel.category) == "Rendez-vous":
+            return rdv_channel
+
+        await self.event.cancel_meeting()
+        meeting_store.set_phase(self.event.id, "cancelled")
+        scheduler.cancel(self.event.id)
+        return None
+
     async def get_meeting_author(self, channel: TextChannel) -> Union[Member, User]:
-        history = channel.history(oldest_first=True, limit=1)
-        history_flat = await history.flatten()
-        user = history_flat[0].mentions[0]
-        return user
+        return await self.tenant.booking_index.get_author(channel)
 
     async def close_meeting(self, interaction: Interaction) -> None:
         embed_reply = Embed(
@@ -607,11 +2208,8 @@ class MeetingView(ui.View):
         channel = interaction.channel
         channel_author = await self.get_meeting_author(channel)  #type: ignore
         closed_by = interaction.user
-
-        # Send the closing message to the help thread
-        await channel.send(embed=embed_reply) #type: ignore
-        #type: ignore
-        await channel.set_permissions(channel_author, read_messages=False) #type: ignore
+        archives = utils.get(channel.guild.categories, name="Archives") #type: ignore
+        logs = utils.get(interaction.guild.channels, name="logs") #type: ignore
 
         # Send log
         embed_log = Embed(
@@ -624,33 +2222,45 @@ class MeetingView(ui.View):
             colour=0xDD2E44,  # Red
         )
 
-        await channel.edit(category=utils.get(channel.guild.categories, name="Archives"), sync_permissions=True) #type: ignore
-        await utils.get(interaction.guild.channels, name="logs").send(embed=embed_log) #type: ignore
+        # Closing message, move with the author's access removed, and log all at once
+        await asyncio.gather(
+            rest("send_message", channel.id, channel.send, embed=embed_reply), #type: ignore
+            rest("edit_channel", channel.id, channel.edit, category=archives, overwrites=overwrites_for(archives, channel_author, read_messages=False)), #type: ignore
+            rest("send_message", logs.id, logs.send, embed=embed_log)) #type: ignore
+
+    async def cancel_upcoming(self) -> None:
+        # A meeting closed before it starts gives its slot back
         if self.event:
+            scheduler.cancel(self.event.id)
             if datetime.now(pytimezone(UTC)) < self.event.start:
                 await self.event.cancel_meeting()
+                meeting_store.set_phase(self.event.id, "cancelled")
 
-
-    @ui.button(label="Reprendre un RDV", style=ButtonStyle.primary, custom_id=f"take_other_meet", disabled=True)
-    async def take_other_meeting(self, button: Button, interaction: Interaction) -> None:
+    @staticmethod
+    @metrics.timed("view.take_other_meeting")
+    async def take_other_meeting(interaction: Interaction) -> None:
         embed = Embed(title="Engagement", description="En cliquant sur accepter vous vous engager a payer apres le rendez-vous", colour=Colour.blue())
-        await interaction.response.send_message(embed=embed, view=AcceptConditionsView(), ephemeral=True)
+        await respond(interaction.response.send_message, embed=embed, view=AcceptConditionsView(), ephemeral=True)
     
-    @ui.button(label="Fermer", style=ButtonStyle.red, custom_id=f"meet_close_button")
-    async def close_meeting_button(self, button: Button, interaction: Interaction) -> None:
-        for children in self.children:
-            children.disabled = True  #type: ignore
-        await interaction.response.edit_message(view=self)
-        await self.close_meeting(interaction)
-
-
-class AcceptConditionsView(ui.View):
+    @classmethod
+    @metrics.timed("view.close_meeting")
+    async def close_meeting_button(cls, tenant: Tenant, event_id: str, interaction: Interaction) -> None:
+        # Answered and archived without the calendar, which only the slot of an upcoming meeting needs
+        await respond(interaction.response.edit_message, view=MeetingView(event_id, "closed"))
+        await cls(tenant, CalendarEvent({}, tenant.calendar)).close_meeting(interaction)
+        if event_id:
+            meeting = await cls.resolve(tenant, event_id)
+            await meeting.cancel_upcoming()
+
+
+class AcceptConditionsView(CalendarView):
     def __init__(self):
         super().__init__(timeout = 60*2)
         self.value = None
 
 
     @ui.button(label="Accepter", style=ButtonStyle.green)
+    @metrics.timed("view.accept_conditions")
     async def confirm(self, button: ui.Button, interaction: Interaction) -> None:
         await TakeMeetingView().take_meeting(interaction)
         self.value = True
@@ -658,18 +2268,20 @@ class AcceptConditionsView(ui.View):
 
 
     @ui.button(label="Annuler", style=ButtonStyle.danger)
+    @metrics.timed("view.refuse_conditions")
     async def cancel(self, button: ui.Button, interaction: Interaction) -> None:
         self.value = False
         self.stop()
 
 
-class RetakeMeetingView(ui.View):
+class RetakeMeetingView(CalendarView):
     def __init__(self, event):
         super().__init__(timeout = None)
         self.value = None
         self.event = event
 
     @ui.button(label="Confirmer", style=ButtonStyle.green)
+    @metrics.timed("view.retake_meeting")
     async def confirm(self, button: ui.Button, interaction: Interaction) -> None:
         await TakeMeetingView().take_meeting(interaction)
         self.value = True
@@ -677,6 +2289,7 @@ class RetakeMeetingView(ui.View):
 
     # This one is similar to the confirmation button except sets the inner value to `False`
     @ui.button(label="Annuler", style=ButtonStyle.danger)
+    @metrics.timed("view.cancel_retake")
     async def cancel(self, button: ui.Button, interaction: Interaction) -> None:
         await self.event.cancel_meeting(interaction, False)
         self.value = False
@@ -688,26 +2301,234 @@ class Meetings(commands.Cog):
         self.client = client
         self.client.loop.create_task(self.create_views())
         self.client.loop.create_task(self.get_alerts())
-        
+        self.web = web.Application()
+        self.web.router.add_get("/metrics", self.metrics_endpoint)
+        self.web.router.add_post(WATCH_PATH, tenants.receive)
+        self.runner: Union[web.AppRunner, None] = None
+        self.refreshing: set[int] = set()
+        self.tasks = [
+            self.client.loop.create_task(scheduler.run()),
+            self.client.loop.create_task(metrics.monitor_loop()),
+            self.client.loop.create_task(self.serve_http()),
+            self.client.loop.create_task(self.log_metrics()),
+            self.client.loop.create_task(self.compact_archives()),
+        ]
+        tenants.on_load.append(self.start_tenant)
+        # A single community is loaded right away, as before tenants existed
+        if len(tenants.settings) == 1:
+            tenants.get(next(iter(tenants.settings)))
+
+    def cog_unload(self):
+        tenants.on_load.remove(self.start_tenant)
+        for task in self.tasks:
+            task.cancel()
+        for tenant in tenants.tenants.values():
+            self.client.loop.create_task(tenant.watcher.stop())
+        if self.runner:
+            self.client.loop.create_task(self.runner.cleanup())
+
+    def start_tenant(self, tenant: Tenant) -> None:
+        loop = self.client.loop
+        credentials = tenant.calendar.credentials
+        if id(credentials) not in self.refreshing:
+            self.refreshing.add(id(credentials))
+            self.tasks.append(loop.create_task(credentials.keep_fresh(tenant.calendar.executor)))
+        self.tasks += [
+            loop.create_task(tenant.calendar.warm_up()),
+            loop.create_task(tenant.watcher.ingest()),
+            # Notifications can only be received through the HTTP server
+            loop.create_task(tenant.watcher.run(push=bool(HTTP_PORT))),
+            loop.create_task(self.recover(tenant)),
+            loop.create_task(tenant.availability.sweep_loop(RESERVATION_TIMEOUT)),
+        ]
+
+    async def serve_http(self):
+        if not HTTP_PORT:
+            return
+        self.runner = web.AppRunner(self.web)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, HTTP_HOST, HTTP_PORT).start()
+        print(f"http: listening on {HTTP_HOST}:{HTTP_PORT}")
+
+    async def metrics_endpoint(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain")
+
+    async def log_metrics(self):
+        if not METRICS_LOG_INTERVAL:
+            return
+        while True:
+            await sleep(METRICS_LOG_INTERVAL)
+            for line in metrics.report():
+                print(f"metrics: {line}")
+
+    async def compact_archives(self):
+        if not ARCHIVE_INTERVAL:
+            return
+        await self.client.wait_until_ready()
+        while True:
+            for tenant in list(tenants.tenants.values()):
+                guild = self.client.get_guild(tenant.guild_id)
+                if not guild:
+                    continue
+                started = time.perf_counter()
+                compacted = await archive_compactor.compact(tenant, guild)
+                if compacted:
+                    print(f"archives: {compacted} channels of guild {tenant.guild_id} compacted in {time.perf_counter() - started:.2f}s")
+            await sleep(ARCHIVE_INTERVAL)
 
     async def create_views(self):
         self.client.add_view(TakeMeetingView())
-        self.client.add_view(MeetingView(CalendarEvent({})))
-        
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: Interaction):
+        if interaction.type != InteractionType.component:
+            return
+        custom_id = (interaction.data or {}).get('custom_id', "")
+        if custom_id.startswith(f"{MeetingView.PREFIX}:"):
+            _, action, event_id = custom_id.split(":", 2)
+        elif custom_id in LEGACY_MEETING_BUTTONS:
+            # Messages sent before the event id was in the custom_id
+            action = LEGACY_MEETING_BUTTONS[custom_id]
+            row = meeting_store.by_channel(interaction.channel_id) #type: ignore
+            event_id = row['event_id'] if row else ""
+        else:
+            return
+
+        tenant = tenants.get(interaction.guild_id)
+        if not tenant:
+            return
+        # The meeting is only resolved once the click is answered, within Discord's 3 seconds
+        try:
+            if action == "close":
+                await Meeting.close_meeting_button(tenant, event_id, interaction)
+            elif action == "retake":
+                await Meeting.take_other_meeting(interaction)
+        except CalendarUnavailable:
+            await send_unavailable(interaction)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        tenant = tenants.loaded(channel.guild.id)
+        if tenant and isinstance(channel, TextChannel) and channel.name.startswith("rdv"):
+            author = tenant.booking_index.author_from_overwrites(channel)
+            if author:
+                tenant.booking_index.add(author.id, channel.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        tenant = tenants.loaded(after.guild.id)
+        if not tenant or not isinstance(after, TextChannel):
+            return
+        if not after.name.startswith("rdv"):
+            tenant.booking_index.remove_channel(after.id)
+        elif after.id not in tenant.booking_index.authors:
+            author = tenant.booking_index.author_from_overwrites(after)
+            if author:
+                tenant.booking_index.add(author.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        tenant = tenants.loaded(channel.guild.id)
+        if tenant:
+            tenant.booking_index.remove_channel(channel.id)
+
+    async def rehydrate(self, jobs: list, label: str) -> None:
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(REHYDRATE_CONCURRENCY)
+
+        async def bounded(job):
+            async with semaphore:
+                await job
+
+        results = await asyncio.gather(*[bounded(job) for job in jobs], return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        for error in failed:
+            print(f"meetings: rehydration failed: {error}")
+        print(f"meetings: {len(jobs) - len(failed)}/{len(jobs)} meetings rehydrated for {label} in {time.perf_counter() - started:.2f}s")
 
     async def get_alerts(self):
+        # Guilds with meetings in the store are loaded now, the others when they are first used
+        await self.client.wait_until_ready()
+        jobs = []
+        for meeting in meeting_store.pending():
+            tenant = tenants.get(meeting['guild_id'])
+            if tenant:
+                jobs.append(self.rehydrate_meeting(tenant, meeting))
+        await self.rehydrate(jobs, "the store")
+
+    async def recover(self, tenant: Tenant):
         await self.client.wait_until_ready()
-        events = calendar.list_events(timeMin=(datetime.now(pytimezone(UTC)) - timedelta(minutes=30))).get('items', [])
+        guild = self.client.get_guild(tenant.guild_id)
+        if guild and not tenant.booking_index.ready:
+            await tenant.booking_index.build(guild)
+        await self.migrate_bookings(tenant)
+        if meeting_store.pending(tenant.guild_id):
+            return
 
-        for event in events:
-            event = CalendarEvent(event)
-            if event.summary.startswith("Rendez-vous") and datetime.now(pytimezone(UTC)) < event.end:
-                description = event.description.split("\n\n")
-                channel = self.client.get_channel(int(event.location))
-                history = await channel.history(oldest_first=True, limit=1).flatten() #type: ignore
-                message = history[0]
-                guild = self.client.get_guild(GUILD_ID)
-                await MeetingView(event).schedule_alert(guild, guild.get_member(int(description[len(description)-1])), message)  #type: ignore  
+        # Nothing in the store: meetings booked before the store existed are recovered from the calendar once
+        now = datetime.now(pytimezone(UTC))
+        jobs = []
+        async for event in tenant.calendar.iter_events(
+                now - timedelta(minutes=30),
+                now + timedelta(days=BOOKING_HORIZON_DAYS),
+                private={'status': 'booked'}):
+            event = CalendarEvent(event, tenant.calendar)
+            if datetime.now(pytimezone(UTC)) < event.end:
+                jobs.append(self.rehydrate_event(tenant, event))
+        await self.rehydrate(jobs, f"guild {tenant.guild_id}")
+
+    async def rehydrate_meeting(self, tenant: Tenant, meeting: sqlite3.Row) -> None:
+        event = await tenant.calendar.cache.get_event(meeting['event_id'])
+        guild = self.client.get_guild(meeting['guild_id'])
+        channel = guild.get_channel(meeting['channel_id']) if guild else None
+        if not event or not channel:
+            meeting_store.set_phase(meeting['event_id'], "cancelled")
+            return
+        message = channel.get_partial_message(meeting['message_id']) #type: ignore
+        member = guild.get_member(meeting['user_id']) #type: ignore
+        await Meeting(tenant, CalendarEvent(event, tenant.calendar)).schedule_alert(guild, member, message, meeting['phase'])
+
+    async def rehydrate_event(self, tenant: Tenant, event: CalendarEvent) -> None:
+        guild = self.client.get_guild(tenant.guild_id)
+        channel = guild.get_channel(int(event.private['channel'])) #type: ignore
+        message = channel.get_partial_message(int(event.private['message'])) #type: ignore
+        user_id = int(event.private['user'])
+        meeting_store.save(event, tenant.guild_id, channel.id, message.id, user_id) #type: ignore
+        await Meeting(tenant, event).schedule_alert(guild, guild.get_member(user_id), message)  #type: ignore  
+
+    async def migrate_bookings(self, tenant: Tenant):
+        # Bookings made before the extended properties only have their user in the
+        # last line of the description and their channel in the location
+        key = f"bookings_migrated:{tenant.guild_id}"
+        if meeting_store.get_meta(key):
+            return
+
+        # Bookings can't be made beyond the horizon, so neither can legacy ones be waiting there
+        now = datetime.now(pytimezone(UTC))
+        requests = []
+        async for event in tenant.calendar.iter_events(
+                now - timedelta(minutes=30),
+                now + timedelta(days=BOOKING_HORIZON_DAYS),
+                q="Rendez-vous",
+                fields=LIST_FIELDS_WITH_DESCRIPTION):
+            event = CalendarEvent(event, tenant.calendar)
+            if not event.summary.startswith("Rendez-vous") or 'user' in event.private or not event.location:
+                continue
+            user_id = event.description.split("\n\n")[-1]
+            channel = self.client.get_channel(int(event.location))
+            if not user_id.isdigit() or not channel:
+                print(f"meetings: booking {event.id} can't be migrated")
+                continue
+            history = await rest("history", channel.id, lambda: channel.history(oldest_first=True, limit=1).flatten()) #type: ignore
+            private = {'user': user_id, 'channel': str(channel.id), 'message': str(history[0].id), 'status': "booked"}
+            requests.append(tenant.calendar.request('patch', eventId=event.id, body={'extendedProperties': {'private': private}}))
+
+        failed = [error for _, error in await tenant.calendar.batch(requests) if error]
+        for error in failed:
+            print(f"meetings: booking migration failed: {error}")
+        if not failed:
+            meeting_store.set_meta(key, "1")
+        print(f"meetings: {len(requests) - len(failed)} bookings of guild {tenant.guild_id} migrated to extended properties")
 
 
     @application_checks.has_permissions(manage_messages=True)
@@ -721,20 +2542,43 @@ class Meetings(commands.Cog):
         if not channel:
             channel = interaction.channel #type: ignore
         
-        await channel.purge(limit=int(limit) if limit else None)
+        await rest("purge", channel.id, channel.purge, limit=int(limit) if limit else None)
         
         embed = Embed(title="Le salon a été purgé", color=nextcord.Colour.green())
 
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await respond(interaction.response.send_message, embed=embed, ephemeral=True)
 
 
+    @application_checks.is_owner()
+    @slash_command(name="stats", description="Statistiques de performance du bot")
+    async def stats(self, interaction: Interaction):
+        tenant: Tenant = tenants.get(interaction.guild_id) #type: ignore
+        flight = tenant.calendar.flight.stats
+        cache = tenant.calendar.cache.stats
+        watcher = tenant.watcher
+        embed = Embed(title="Statistiques", color=nextcord.Colour.blue())
+        embed.description = "\n".join(metrics.report())[:4000] or "Aucune donnée pour le moment"
+        embed.add_field(name="Boucle", value=f"latence {metrics.loop_lag * 1000:.1f}ms, max {metrics.loop_lag_max * 1000:.1f}ms")
+        embed.add_field(name="Cache agenda", value=f"{cache['hits']} hits, {cache['misses']} syncs, {cache['coalesced']} attentes")
+        embed.add_field(name="Requêtes agenda", value=f"{flight['misses']} envoyées, {flight['coalesced']} regroupées")
+        embed.add_field(name="Agenda push", value=f"{'actif' if watcher.live() else 'inactif'}, {watcher.stats['notifications']} notifications, {watcher.stats['polls']} sondages")
+        embed.add_field(name="Pages de créneaux", value=f"{tenant.slot_browser.stats['hits']} hits, {tenant.slot_browser.stats['misses']} rendus")
+        embed.add_field(name="Archives", value=f"{archive_compactor.stats['channels']} salons compactés, {archive_compactor.stats['messages']} messages")
+        embed.add_field(name="Communautés", value=f"{len(tenants.tenants)} chargées sur {len(tenants.settings)}")
+        embed.add_field(name="Discord", value=f"{rest_queue.stats['rate_limited']} limitées, {rest_queue.stats['parked']} mises en attente")
+        await respond(interaction.response.send_message, embed=embed, ephemeral=True)
+
     @application_checks.is_owner()
     @slash_command(name="prepare")
     async def prepare(self, interaction: Interaction):
-        await interaction.channel.purge() #type: ignore
+        if not tenants.get(interaction.guild_id):
+            embed = Embed(title="Aucun agenda n'est configuré pour ce serveur", color=nextcord.Colour.red())
+            await respond(interaction.response.send_message, embed=embed, ephemeral=True)
+            return
+        await rest("purge", interaction.channel.id, interaction.channel.purge) #type: ignore
         embed = Embed(title="Prise de Rendez-Vous", description="Pour prendre un rendez-vous", color=nextcord.Colour.blue())
         embed.set_footer(text="Vous pouvez enlever les messages en apppuyant sur \"rejeter le message\"")
-        await interaction.response.send_message(embed=embed, view=TakeMeetingView())
+        await respond(interaction.response.send_message, embed=embed, view=TakeMeetingView())
 
 
     """@application_checks.is_owner()
@@ -1,19 +1,26 @@
 import os
+import time
 import nextcord
 
+STARTED = time.perf_counter()
+
 from os import environ as env
 
 from nextcord import Intents, Interaction
-from nextcord.ext.commands import Bot, errors
+from nextcord.ext.commands import AutoShardedBot, Bot, errors
 from nextcord.ext.application_checks import errors as application_errors
 
 
-class Client(Bot):
+# Serving many guilds, the gateway connection is split across shards
+Base = AutoShardedBot if env.get('SHARDED', '').lower() in ('1', 'true') else Bot
+
+
+class Client(Base):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     async def on_ready(self):
-        print("Ready")
+        print(f"Ready ({time.perf_counter() - STARTED:.2f}s after start)")
 
     async def on_command_error(self, ctx, error):
         if isinstance(error, errors.CommandNotFound):
@@ -62,10 +69,12 @@ class Client(Bot):
 client = Client("=", intents=Intents(messages=True, guilds=True, members=True, message_content=True)) #type: ignore
 
 # Loading cogs
-for filename in os.listdir("./cogs"):
+for filename in sorted(os.listdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), "cogs"))):
     if filename.endswith('.py'):
+        loading = time.perf_counter()
         client.load_extension(f'cogs.{filename[:-3]}')
-        print(f"cogs: {filename[:-3]} cog loaded.")
+        print(f"cogs: {filename[:-3]} cog loaded in {time.perf_counter() - loading:.2f}s.")
+print(f"Cold start: {time.perf_counter() - STARTED:.2f}s before connecting")
 
 if __name__ == '__main__':
     client.run(env['DISCORD_TOKEN'])